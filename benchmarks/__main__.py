@@ -0,0 +1,112 @@
+"""
+Run the benchmarks for the container hot paths.
+
+Usage::
+
+    python -m benchmarks [-k PATTERN] [--save NAME] [--compare NAME]
+
+Every ``bench_*`` function in the ``benchmarks.bench_*`` modules performs
+its setup and returns a zero-argument callable which is timed. Results are
+stored as JSON in ``.benchmarks/`` so runs can be compared across commits.
+
+"""
+
+import argparse
+import fnmatch
+import importlib
+import json
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import timeit
+
+import benchmarks
+
+RESULTS_DIR = '.benchmarks'
+
+
+def discover(pattern=None):
+    for info in pkgutil.iter_modules(benchmarks.__path__):
+        if not info.name.startswith('bench_'):
+            continue
+        module = importlib.import_module('benchmarks.' + info.name)
+        for name in sorted(dir(module)):
+            if not name.startswith('bench_'):
+                continue
+            full_name = '{}.{}'.format(info.name[6:], name[6:])
+            if pattern and not fnmatch.fnmatch(full_name, pattern):
+                continue
+            yield full_name, getattr(module, name)
+
+
+def measure(setup, repeat=5):
+    timer = timeit.Timer(setup())
+    # run enough iterations to take at least 0.2 seconds per repeat
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e9
+
+
+def git_revision():
+    try:
+        out = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return out.decode('ascii').strip()
+
+
+def results_path(name):
+    if os.sep in name or name.endswith('.json'):
+        return name
+    return os.path.join(RESULTS_DIR, name + '.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('-k', dest='pattern', help='only run matching benchmarks')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--save', help='name of the results file, defaults to the git revision'
+    )
+    parser.add_argument('--compare', help='name of a previous results file')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(results_path(args.compare)) as fp:
+            baseline = json.load(fp)['results']
+
+    revision = git_revision()
+    results = {}
+    for name, setup in discover(args.pattern):
+        nsec = results[name] = measure(setup, repeat=args.repeat)
+        line = '{:<40} {:>10.1f} ns'.format(name, nsec)
+        if name in baseline:
+            line += '  {:>+7.1%}'.format(nsec / baseline[name] - 1)
+        print(line)
+        sys.stdout.flush()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = results_path(args.save or revision)
+    with open(path, 'w') as fp:
+        json.dump(
+            {
+                'revision': revision,
+                'python': platform.python_implementation()
+                + ' '
+                + platform.python_version(),
+                'results': results,
+            },
+            fp,
+            indent=2,
+            sort_keys=True,
+        )
+    print('saved results to {}'.format(path))
+
+
+if __name__ == '__main__':
+    main()
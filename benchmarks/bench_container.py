@@ -0,0 +1,210 @@
+"""
+Benchmarks for ``ServiceRegistry`` and ``ServiceContainer``.
+
+Run with ``python -m benchmarks.bench_container`` to report the number of
+memory blocks allocated by ``create_container``, or as part of the suite via
+``python -m benchmarks``.
+
+"""
+
+import sys
+from zope.interface import Interface
+
+from wired import ServiceRegistry
+
+
+class IService(Interface):
+    pass
+
+
+class Service:
+    pass
+
+
+class Context:
+    pass
+
+
+class OtherContext:
+    pass
+
+
+def make_registry():
+    registry = ServiceRegistry()
+    registry.register_factory(lambda c: Service(), Service)
+    registry.register_factory(lambda c: Service(), IService)
+    registry.register_factory(lambda c: Service(), name='named')
+    registry.register_factory(lambda c: Service(), Service, context=Context)
+    return registry
+
+
+def bench_create_container():
+    registry = make_registry()
+    return registry.create_container
+
+
+def bench_request_new_container():
+    registry = make_registry()
+
+    def request():
+        container = registry.create_container()
+        container.get(Service)
+        container.get(Service, context=Context())
+
+    return request
+
+
+def bench_request_reset_container():
+    container = make_registry().create_container()
+
+    def request():
+        container.get(Service)
+        container.get(Service, context=Context())
+        container.reset()
+
+    return request
+
+
+def make_config_registry(count=10):
+    # services depending only on the deployment, which a template prepares
+    registry = ServiceRegistry()
+    names = ['config{}'.format(idx) for idx in range(count)]
+    for name in names:
+        registry.register_factory(lambda c: Service(), name=name)
+    return registry, names
+
+
+def bench_config_new_container():
+    registry, names = make_config_registry()
+
+    def request():
+        container = registry.create_container()
+        for name in names:
+            container.get(name=name)
+
+    return request
+
+
+def bench_config_fork_container():
+    registry, names = make_config_registry()
+    template = registry.create_container()
+    for name in names:
+        template.get(name=name)
+
+    def request():
+        container = template.fork()
+        for name in names:
+            container.get(name=name)
+
+    return request
+
+
+def bench_get_cached():
+    container = make_registry().create_container()
+    container.get(Service)
+    return lambda: container.get(Service)
+
+
+def bench_get_cached_iface():
+    container = make_registry().create_container()
+    container.get(IService)
+    return lambda: container.get(IService)
+
+
+def bench_get_resolver():
+    registry = make_registry()
+    resolve = registry.resolver(Service)
+    container = registry.create_container()
+    resolve(container)
+    return lambda: resolve(container)
+
+
+def bench_get_container_resolver():
+    container = make_registry().create_container()
+    resolve = container.resolver(Service)
+    resolve()
+    return resolve
+
+
+def bench_get_many():
+    container = make_registry().create_container()
+    ifaces = [Service, IService, (Interface, 'named')] * 4
+    container.get_many(ifaces)
+    return lambda: container.get_many(ifaces)
+
+
+def bench_get_many_separately():
+    container = make_registry().create_container()
+    ifaces = [Service, IService, Interface] * 4
+    names = ['', '', 'named'] * 4
+
+    def run():
+        get = container.get
+        return [get(iface, name=name) for iface, name in zip(ifaces, names)]
+
+    run()
+    return run
+
+
+def bench_get_uncached():
+    registry = make_registry()
+    return lambda: registry.create_container().get(Service)
+
+
+def bench_get_named():
+    container = make_registry().create_container()
+    container.get(name='named')
+    return lambda: container.get(name='named')
+
+
+def bench_get_context():
+    context = Context()
+    container = make_registry().create_container()
+    container.get(Service, context=context)
+    return lambda: container.get(Service, context=context)
+
+
+def bench_get_bound_context():
+    container = make_registry().create_container(context=Context())
+    container.get(Service)
+    return lambda: container.get(Service)
+
+
+def bench_get_fallback_to_none():
+    context = OtherContext()
+    container = make_registry().create_container()
+    container.get(IService, context=context)
+    return lambda: container.get(IService, context=context)
+
+
+def bench_get_default():
+    container = make_registry().create_container()
+    return lambda: container.get(OtherContext, default=None)
+
+
+def bench_set():
+    registry = make_registry()
+
+    def run():
+        registry.create_container().set(Service(), Service)
+
+    return run
+
+
+def count_allocations(fn, number=10000):
+    # keep the results alive so their memory is not reused
+    results = []
+    start = sys.getallocatedblocks()
+    for _ in range(number):
+        results.append(fn())
+    return (sys.getallocatedblocks() - start) / number
+
+
+def main():
+    registry = make_registry()
+    blocks = count_allocations(registry.create_container)
+    print(f'create_container: {blocks:.1f} blocks')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare the interpreted and generated factories for dataclass services.
+
+Run with ``python -m benchmarks.bench_injector`` to compare the two, or as
+part of the suite via ``python -m benchmarks``.
+
+"""
+
+from dataclasses import dataclass
+import timeit
+
+from wired import ServiceContainer, ServiceRegistry
+from wired.dataclasses import Context, injected
+from wired.dataclasses.injector import Injector
+
+
+class Settings:
+    punctuation = '!'
+
+
+class Database:
+    pass
+
+
+class Cache:
+    pass
+
+
+@dataclass
+class View:
+    container: ServiceContainer
+    context: Context
+    settings: Settings
+    db: Database
+    cache: Cache
+    punctuation: str = injected(Settings, attr='punctuation')
+    greeting: str = 'Hello'
+
+
+def make_container():
+    registry = ServiceRegistry()
+    registry.register_singleton(Settings(), Settings)
+    registry.register_factory(lambda c: Database(), Database)
+    registry.register_factory(lambda c: Cache(), Cache)
+    container = registry.create_container()
+    # warm the container so only the injector is measured
+    for iface in (Settings, Database, Cache):
+        container.get(iface)
+    return container
+
+
+def _bench(codegen):
+    container = make_container()
+    injector = Injector(View, codegen=codegen)
+    injector(container)
+    return lambda: injector(container)
+
+
+def bench_interpreted():
+    return _bench(False)
+
+
+def bench_generated():
+    return _bench(True)
+
+
+def run(number=100000, repeat=5):
+    results = {}
+    for label, codegen in (('interpreted', False), ('generated', True)):
+        timer = timeit.Timer(_bench(codegen))
+        best = min(timer.repeat(repeat=repeat, number=number))
+        results[label] = best / number * 1e9
+    return results
+
+
+def main():
+    results = run()
+    for label, nsec in results.items():
+        print(f'{label:>12}: {nsec:8.1f} ns per instance')
+    speedup = results['interpreted'] / results['generated']
+    print(f'{"speedup":>12}: {speedup:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare registering factories one at a time with ``ServiceRegistry.batch``.
+
+Run with ``python -m benchmarks.bench_registration`` to time the startup of
+a registry with 1k, 10k and 100k factories, or as part of the suite via
+``python -m benchmarks``. Registering each factory separately gets slower
+with every registration, so by default it is skipped above 10k factories.
+
+"""
+
+import argparse
+import time
+
+from wired import ServiceRegistry
+
+
+def make_services(count):
+    return [type('Service{}'.format(idx), (), {}) for idx in range(count)]
+
+
+def factory(container):
+    return None
+
+
+def register(services):
+    registry = ServiceRegistry()
+    for service in services:
+        registry.register_factory(factory, service)
+    return registry
+
+
+def register_batch(services):
+    registry = ServiceRegistry()
+    with registry.batch():
+        for service in services:
+            registry.register_factory(factory, service)
+    return registry
+
+
+def bench_register_1k():
+    services = make_services(1000)
+    return lambda: register(services)
+
+
+def bench_register_batch_1k():
+    services = make_services(1000)
+    return lambda: register_batch(services)
+
+
+def run(sizes, sequential_max):
+    results = {}
+    for count in sizes:
+        services = make_services(count)
+        for label, fn in (('sequential', register), ('batch', register_batch)):
+            if label == 'sequential' and count > sequential_max:
+                continue
+            start = time.perf_counter()
+            fn(services)
+            results[(count, label)] = time.perf_counter() - start
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_registration')
+    parser.add_argument('sizes', nargs='*', type=int, default=[1000, 10000, 100000])
+    parser.add_argument(
+        '--sequential-max',
+        type=int,
+        default=10000,
+        help='largest size to register one factory at a time',
+    )
+    args = parser.parse_args(argv)
+    results = run(args.sizes, args.sequential_max)
+    for (count, label), seconds in results.items():
+        print(f'{count:>8} {label:>10}: {seconds:8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure ``ServiceContainer.get`` throughput from several threads at once.
+
+Run with ``python -m benchmarks.bench_threads`` to report the lookups per
+second with 1, 2, 4 and 8 threads, or as part of the suite via
+``python -m benchmarks``. Each thread looks up services from its own
+container created from a shared, frozen registry. On a free-threaded build
+of CPython the throughput should scale with the number of cores, while with
+the GIL enabled it stays roughly flat.
+
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from wired import ServiceRegistry
+
+
+class Service:
+    pass
+
+
+class Context:
+    pass
+
+
+def make_registry():
+    registry = ServiceRegistry()
+    registry.register_factory(lambda c: Service(), Service)
+    registry.register_factory(lambda c: Service(), Service, context=Context)
+    registry.register_factory(lambda c: Service(), name='named')
+    registry.freeze()
+    return registry
+
+
+def worker(registry, iterations, barrier):
+    container = registry.create_container()
+    context = Context()
+    get = container.get
+    barrier.wait()
+    for _ in range(iterations):
+        get(Service)
+        get(Service, context=context)
+        get(name='named')
+
+
+def run_threads(registry, count, iterations):
+    barrier = threading.Barrier(count + 1)
+    threads = [
+        threading.Thread(target=worker, args=(registry, iterations, barrier))
+        for _ in range(count)
+    ]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_get_4_threads():
+    registry = make_registry()
+    return lambda: run_threads(registry, 4, 1000)
+
+
+def gil_enabled():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_threads')
+    parser.add_argument('threads', nargs='*', type=int, default=[1, 2, 4, 8])
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=100000,
+        help='lookups of each service per thread',
+    )
+    args = parser.parse_args(argv)
+    registry = make_registry()
+    print('GIL enabled: {}'.format(gil_enabled()))
+    for count in args.threads:
+        seconds = run_threads(registry, count, args.iterations)
+        lookups = count * args.iterations * 3
+        print(f'{count:>4} threads: {lookups / seconds:>12,.0f} lookups/s')
+
+
+if __name__ == '__main__':
+    main()
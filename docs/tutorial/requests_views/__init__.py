@@ -95,17 +95,17 @@ def setup(registry: ServiceRegistry, settings: Settings):
 def process_request(registry: ServiceRegistry, url: str) -> str:
     """Given URL (customer name), make a Request to handle interaction"""
 
-    # Make the container that this request gets processed in
-    container = registry.create_container()
+    # Make the container that this request gets processed in, closing it
+    # afterwards frees the Request which refers back to the container
+    with registry.create_container() as container:
+        # Put the url into the container
+        container.register_singleton(url, Url)
 
-    # Put the url into the container
-    container.register_singleton(url, Url)
+        # Create a View to generate the greeting
+        view = container.get(View)
 
-    # Create a View to generate the greeting
-    view = container.get(View)
-
-    # Generate a response
-    response = view()
+        # Generate a response
+        response = view()
 
     return response
 
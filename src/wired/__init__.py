@@ -1,4 +1,4 @@
-__all__ = ['ServiceContainer', 'ServiceRegistry', 'service_factory']
+__all__ = ['ServiceContainer', 'ServiceHook', 'ServiceRegistry', 'service_factory']
 
-from .container import ServiceContainer, ServiceRegistry
+from .container import ServiceContainer, ServiceHook, ServiceRegistry
 from .decorators import service_factory
@@ -1,10 +1,17 @@
+import asyncio
+from collections import OrderedDict, namedtuple
+import concurrent.futures
+from contextlib import contextmanager
+import inspect
+import threading
+import time
 import weakref
 from zope.interface import Interface, implementedBy, providedBy
 from zope.interface.adapter import AdapterRegistry
 from zope.interface.interface import InterfaceClass
 from zope.interface.interfaces import IInterface
 
-__all__ = ['ServiceContainer', 'ServiceRegistry']
+__all__ = ['ServiceContainer', 'ServiceHook', 'ServiceRegistry']
 
 
 class Sentinel:
@@ -17,27 +24,65 @@ class Sentinel:
 
 _marker = Sentinel('default')
 
+# providedBy(None) takes a slow path through zope.interface and None is
+# the most common context, the declaration is immutable so compute it once
+_none_iface = providedBy(None)
+
+# guards the lookup caches of any AdapterRegistry used to find factories,
+# a frozen registry is immutable and never takes it
+_lookup_lock = threading.Lock()
+
+LIFETIMES = ('container', 'singleton', 'transient')
+
+ContextCacheInfo = namedtuple(
+    'ContextCacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize']
+)
+
+ServicePoolInfo = namedtuple(
+    'ServicePoolInfo',
+    ['maxsize', 'size', 'in_use', 'checkouts', 'waits', 'wait_time', 'max_wait'],
+)
+
 
 class IServiceFactory(Interface):
     """A marker interface for service factories."""
 
 
-class IServiceInstance(Interface):
-    """A marker interface for service instances."""
+class _AsyncFactoryRequired(RuntimeError):
+    # raised by get when an async factory must be invoked, the arguments
+    # are used by aget to invoke it
+    def __str__(self):
+        return _ASYNC_FACTORY_MESSAGE
 
 
-class IContextFinalizer(Interface):
-    """A marker interface for a finalizer invocable when a context dies."""
+_ASYNC_FACTORY_MESSAGE = 'the service factory is async, use aget to create the service'
 
 
 class ServiceFactoryInfo:
-    def __init__(self, factory, service_iface, context_iface, wants_context):
+    def __init__(
+        self, factory, service_iface, context_iface, wants_context, lifetime='container'
+    ):
+        if lifetime not in LIFETIMES:
+            raise ValueError('unknown service lifetime {!r}'.format(lifetime))
+
         # Use the __wired_factory__ protocol if present
         _factory = getattr(factory, '__wired_factory__', factory)
+        is_async = _is_async_factory(_factory)
+        if lifetime == 'singleton':
+            if is_async:
+                _factory = AsyncLazySingletonServiceWrapper(_factory)
+            else:
+                _factory = LazySingletonServiceWrapper(_factory)
         self.factory = _factory
         self.service_iface = service_iface
         self.context_iface = context_iface
         self.wants_context = wants_context
+        self.lifetime = lifetime
+        self.is_async = is_async
+
+        # a pooled instance is exclusive to the container which checked it
+        # out, it must not be shared with containers forked from it
+        self.shared = not isinstance(_factory, ServicePool)
 
 
 class SingletonServiceWrapper:
@@ -48,6 +93,308 @@ class SingletonServiceWrapper:
         return self.service
 
 
+class LazySingletonServiceWrapper:
+    def __init__(self, factory):
+        self.factory = factory
+        self.service = _marker
+        self.lock = threading.RLock()
+
+    def __call__(self, services):
+        service = self.service
+        if service is _marker:
+            # only one thread may invoke the factory, any others will wait
+            # for it to finish and then use the same service
+            with self.lock:
+                service = self.service
+                if service is _marker:
+                    service = self.service = self.factory(services)
+        return service
+
+
+class AsyncLazySingletonServiceWrapper:
+    def __init__(self, factory):
+        self.factory = factory
+        self.service = _marker
+        self.future = None
+        self.task = None
+        self.lock = threading.Lock()
+
+    async def __call__(self, services):
+        service = self.service
+        if service is _marker:
+            # the first caller starts the factory on its own event loop and
+            # any others, on any loop, await the same result. A failure is
+            # discarded so the next call retries.
+            with self.lock:
+                future = self.future
+                if future is None:
+                    future = self.future = concurrent.futures.Future()
+                    self.task = asyncio.ensure_future(self._create(services, future))
+            service = await asyncio.shield(asyncio.wrap_future(future))
+        return service
+
+    async def _create(self, services, future):
+        try:
+            service = await self.factory(services)
+        except BaseException as ex:
+            with self.lock:
+                self.future = self.task = None
+            future.set_exception(ex)
+        else:
+            self.service = service
+            self.task = None
+            future.set_result(service)
+
+
+class ServicePool:
+    """
+    A bounded pool of service instances shared by every container.
+
+    Create a pool via :meth:`wired.ServiceRegistry.register_pooled`.
+
+    Each container checks out an instance the first time the service is
+    requested and returns it to the pool when the container is closed,
+    reset or garbage collected. A new instance is created from the factory
+    only when the pool is empty and fewer than ``maxsize`` instances exist,
+    otherwise the container waits for one to be returned.
+
+    """
+
+    def __init__(self, factory, maxsize, timeout=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        factory = getattr(factory, '__wired_factory__', factory)
+        if _is_async_factory(factory):
+            raise ValueError('an async factory cannot be pooled')
+        self.factory = factory
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.idle = []
+        self.size = self.in_use = 0
+        self.checkouts = self.waits = 0
+        self.wait_time = self.max_wait = 0.0
+        self.lock = threading.Condition()
+
+    def __call__(self, container):
+        service = self.checkout(container)
+        # the instance is also returned if the container is dropped without
+        # being closed, the finalizer only runs once either way
+        checkin = weakref.finalize(container._cache, self.checkin, service)
+        try:
+            container.add_cleanup(checkin)
+        except BaseException:
+            checkin()
+            raise
+        return service
+
+    def checkout(self, container):
+        """
+        Take an instance from the pool, creating one if necessary.
+
+        ``container`` is passed to the factory when a new instance is
+        created. Raises a ``TimeoutError`` if no instance is returned to
+        the pool within the ``timeout``.
+
+        """
+        lock = self.lock
+        started = None
+        with lock:
+            while not self.idle and self.size >= self.maxsize:
+                now = time.perf_counter()
+                if started is None:
+                    started = now
+                    self.waits += 1
+                remaining = None
+                if self.timeout is not None:
+                    remaining = started + self.timeout - now
+                    if remaining <= 0:
+                        raise TimeoutError('timed out waiting for a pooled service')
+                lock.wait(remaining)
+
+            if started is not None:
+                waited = time.perf_counter() - started
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+            self.in_use += 1
+            self.checkouts += 1
+            if self.idle:
+                return self.idle.pop()
+
+            # reserve a slot and create the instance without holding the lock
+            self.size += 1
+
+        try:
+            return self.factory(container)
+        except BaseException:
+            with lock:
+                self.size -= 1
+                self.in_use -= 1
+                lock.notify()
+            raise
+
+    def checkin(self, service):
+        """
+        Return an instance to the pool, waking up a waiting container.
+
+        """
+        with self.lock:
+            self.idle.append(service)
+            self.in_use -= 1
+            self.lock.notify()
+
+    def info(self):
+        """
+        Return statistics about the pool.
+
+        :returns: A named tuple of ``(maxsize, size, in_use, checkouts,
+            waits, wait_time, max_wait)``. ``size`` is the number of
+            instances created, ``waits`` counts the checkouts which had to
+            wait for an instance and ``wait_time`` is their total in seconds.
+
+        """
+        with self.lock:
+            return ServicePoolInfo(
+                self.maxsize,
+                self.size,
+                self.in_use,
+                self.checkouts,
+                self.waits,
+                self.wait_time,
+                self.max_wait,
+            )
+
+
+class ContextCache:
+    """
+    The service instances cached for a single context object.
+
+    Instances are stored by ``(service_iface, context_iface, name)`` and
+    found using the same rules as a ``zope.interface`` adapter lookup. The
+    result of each lookup is memoized in :attr:`hits`, or :attr:`misses` if
+    no instance was found, until another instance is added.
+
+    """
+
+    __slots__ = (
+        'instances',
+        'specs',
+        'extendors',
+        'hits',
+        'misses',
+        'pending',
+        'locks',
+        'finalizer',
+        'context',
+        'private',
+    )
+
+    def __init__(self):
+        self.instances = {}
+        self.hits = {}
+
+        # the context interfaces of every instance, most of the interfaces
+        # in a lookup's resolution order have none and are skipped
+        self.specs = set()
+
+        # the interfaces of the instances which satisfy a lookup for each
+        # interface, in the order they are tried, see add_extendor
+        self.extendors = {}
+        self.misses = set()
+        self.finalizer = None
+
+        # tasks creating services from async factories, see aget
+        self.pending = None
+
+        # locks for creating services in a thread safe container
+        self.locks = None
+
+        # only set for contexts which can neither be hashed nor weakly
+        # referenced to ensure their id is not reused while cached
+        self.context = None
+
+        # the keys of instances which are not copied by update, see fork
+        self.private = None
+
+    def lookup(self, iface, context_iface, name):
+        extendors = self.extendors.get(iface)
+        if not extendors:
+            return _marker
+
+        instances = self.instances
+        specs = self.specs
+        for spec in context_iface.__sro__:
+            if spec not in specs:
+                continue
+            for provided in extendors:
+                inst = instances.get((provided, spec, name), _marker)
+                if inst is not _marker:
+                    return inst
+        return _marker
+
+    def register(self, iface, context_iface, name, inst, shared=True):
+        extendors = self.extendors.get(iface)
+        if extendors is None or iface not in extendors:
+            self.add_extendor(iface)
+        self.specs.add(context_iface)
+        key = (iface, context_iface, name)
+        self.instances[key] = inst
+        if not shared:
+            if self.private is None:
+                self.private = set()
+            self.private.add(key)
+        self.hits.clear()
+        self.misses.clear()
+
+    def add_extendor(self, provided):
+        # the same as AdapterLookup.add_extendor, the first time an interface
+        # is registered under any name or context it is tried after the
+        # interfaces it extends and before the rest. The lists are replaced
+        # rather than changed as another thread may be iterating over them.
+        all_extendors = self.extendors
+        for base in provided.__iro__:
+            extendors = all_extendors.get(base, ())
+            all_extendors[base] = (
+                [e for e in extendors if provided.isOrExtends(e)]
+                + [provided]
+                + [e for e in extendors if not provided.isOrExtends(e)]
+            )
+
+    def update(self, other):
+        # share the instances cached by another context cache with this empty
+        # one, any instances registered afterward are only stored in self
+        self.specs.update(other.specs)
+        self.extendors.update(other.extendors)
+        private = other.private
+        if not private:
+            self.instances.update(other.instances)
+            hits = self.hits
+            for key, inst in other.hits.items():
+                hits[key] = inst
+            self.misses.update(other.misses)
+            return
+
+        # leave out the private instances and any lookups they satisfied
+        excluded = {id(other.instances[key]) for key in private}
+        for key, inst in other.instances.items():
+            if key not in private:
+                self.instances[key] = inst
+        hits = self.hits
+        for key, inst in other.hits.items():
+            if id(inst) not in excluded:
+                hits[key] = inst
+        self.misses.update(other.misses)
+
+    def clear(self):
+        self.instances.clear()
+        self.specs.clear()
+        self.extendors.clear()
+        self.hits.clear()
+        self.misses.clear()
+        self.pending = None
+        self.locks = None
+        self.private = None
+
+
 class ServiceCache:
     """
     A per-context registry that avoids leaking memory when a context object
@@ -56,64 +403,257 @@ class ServiceCache:
     The goal of the cache is to keep any instantiated services alive for
     ``min(context_lifetime, self_lifetime)``.
 
+    Contexts which do not support weakrefs cannot notify the cache when they
+    die. These are instead keyed by value (or by id when unhashable), and
+    optionally bounded to ``maxsize`` by evicting the least recently used.
+
     """
 
     _AdapterRegistry = AdapterRegistry  # for testing
+    _ContextCache = ContextCache  # for testing
 
-    def __init__(self, default=None):
+    def __init__(
+        self, default=None, plans=None, maxsize=None, thread_safe=False, template=None
+    ):
+        if plans is None:
+            plans = {}
         self._default = None
         self._contexts = {}
-        self._ref = weakref.ref(self)
+
+        # only needed once a context supporting weakrefs is cached
+        self._ref = None
+
+        # guards adding contexts and construction locks, the contexts may
+        # be added from several threads when the GIL is disabled
+        self.lock = threading.Lock()
+        self.thread_safe = thread_safe
+
+        # caches for contexts that do not support weakrefs
+        self._values = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+
+        # lookup plans are shared with the service registry unless factories
+        # are registered directly on the container to override them
+        self.plans = self.registry_plans = plans
+        self.factories = None
+
+        # callbacks to run when the container is reset or closed, newest last
+        self.cleanups = None
+        self.closed = False
+
+        # the cache of the container this one was forked from, its instances
+        # are copied into each context cache when it is first used and its
+        # factories are shared until one is registered on this cache
+        self.template = template
+        self.forked = self.inherited = False
+        self._inherit_factories()
 
     def __del__(self):
         # try to remove the finalizers from the contexts incase the context
         # is still alive, there's no sense in having a weakref attached to it
         # now that the cache is dead
         for ctx_id, ctx_cache in self._contexts.items():
-            finalizer = ctx_cache.lookup(
-                (), IContextFinalizer, name='', default=_marker
-            )
-            if finalizer is not _marker:  # pragma: no cover
+            finalizer = ctx_cache.finalizer
+            if finalizer is not None:  # pragma: no cover
                 finalizer.detach()
-
-    def find(self, context=_marker):
-        if context is _marker:
-            context = self._default
-        ctx_id = id(context)
-        return self._contexts.get(ctx_id, None)
-
-    def get(self, context=_marker):
-        if context is _marker:
-            context = self._default
+        self._discard_factories()
+
+    def _discard_factories(self):
+        # factories shared with a fork or template must outlive this cache
+        if self.factories is not None and not (self.forked or self.inherited):
+            _discard_registry(self.factories)
+        self.factories = None
+        self.forked = self.inherited = False
+
+    def _inherit_factories(self):
+        template = self.template
+        if template is not None and template.factories is not None:
+            template.forked = self.inherited = True
+            self.factories = template.factories
+            self.plans = template.plans
+
+    def own_factories(self):
+        # return a registry for factories registered on this cache, which
+        # falls back to any inherited from the template
+        factories = self.factories
+        if factories is None:
+            factories = self.factories = self._AdapterRegistry()
+        elif self.inherited:
+            factories = self.factories = self._AdapterRegistry(bases=(factories,))
+            self.inherited = False
+        return factories
+
+    def run_cleanups(self):
+        # every callback is run even if one fails, the first error is raised
+        # once they are done
+        cleanups = self.cleanups
+        error = None
+        while cleanups:
+            callback = cleanups.pop()
+            try:
+                callback()
+            except Exception as ex:
+                if error is None:
+                    error = ex
+        if error is not None:
+            raise error
+
+    def reset(self):
+        # the cache for None is kept as every container uses it, the other
+        # contexts belong to the previous operation and are dropped
+        contexts = self._contexts
+        none_cache = contexts.get(id(None), None)
+        for ctx_cache in [*contexts.values(), *self._values.values()]:
+            finalizer = ctx_cache.finalizer
+            if finalizer is not None:
+                finalizer.detach()
+            # a resolver may still refer to the memoized lookups
+            ctx_cache.clear()
+        contexts.clear()
+        self._values.clear()
+        if none_cache is not None:
+            contexts[id(None)] = none_cache
+        self.hits = self.misses = self.evictions = 0
+        self.plans = self.registry_plans
+        self._discard_factories()
+
+        # start over from the services of the template
+        template = self.template
+        if template is not None:
+            self._inherit_factories()
+            source = template._contexts.get(id(None), None)
+            if none_cache is not None and source is not None:
+                none_cache.update(source)
+
+    def get(self, context):
         contexts = self._contexts
         ctx_id = id(context)
         ctx_cache = contexts.get(ctx_id, None)
-        if ctx_cache is None:
-            ctx_cache = self._AdapterRegistry()
+        if ctx_cache is not None:
+            return ctx_cache
+
+        values = self._values
+        key, hashable = _context_key(context)
+        ctx_cache = values.get(key, None)
+        if ctx_cache is not None:
             try:
-                finalizer = weakref.finalize(
-                    context,
-                    context_finalizer,
-                    cache_ref=self._ref,
-                    ctx_id=ctx_id,
-                )
-            except TypeError:
-                # not every type supports weakrefs, in which case we
-                # simply cannot release the ctx_cache early
+                values.move_to_end(key)
+            except KeyError:
+                # evicted by another thread in the meantime
                 pass
             else:
-                finalizer.atexit = False
-                ctx_cache.register((), IContextFinalizer, '', finalizer)
+                self.hits += 1
+                return ctx_cache
+
+        with self.lock:
+            # another thread may have added the context while waiting
+            ctx_cache = contexts.get(ctx_id, None) or values.get(key, None)
+            return ctx_cache or self._add(context, ctx_id, key, hashable)
+
+    def _add(self, context, ctx_id, key, hashable):
+        contexts = self._contexts
+        values = self._values
+        ctx_cache = self._ContextCache()
+        template = self.template
+        if template is not None:
+            source = template._contexts.get(ctx_id, None) or template._values.get(
+                key, None
+            )
+            if source is not None:
+                ctx_cache.update(source)
+        if context is None:
+            # None is immortal so there is no risk of reusing its id
+            contexts[ctx_id] = ctx_cache
+            return ctx_cache
+
+        cache_ref = self._ref
+        if cache_ref is None:
+            cache_ref = self._ref = weakref.ref(self)
+        try:
+            finalizer = weakref.finalize(
+                context,
+                context_finalizer,
+                cache_ref=cache_ref,
+                ctx_id=ctx_id,
+            )
+        except TypeError:
+            # not every type supports weakrefs, in which case we
+            # cannot release the ctx_cache early and instead store it
+            # in the bounded cache where it is eventually evicted
+            if not hashable:
+                ctx_cache.context = context
+            values[key] = ctx_cache
+            self.misses += 1
+            if self.maxsize is not None and len(values) > self.maxsize:
+                values.popitem(last=False)
+                self.evictions += 1
+        else:
+            finalizer.atexit = False
+            ctx_cache.finalizer = finalizer
             contexts[ctx_id] = ctx_cache
         return ctx_cache
 
+    def info(self):
+        return ContextCacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self._values)
+        )
+
+
+def _context_key(context):
+    key = (type(context), context)
+    try:
+        hash(key)
+    except TypeError:
+        return (type(context), id(context)), False
+    return key, True
 
-def context_finalizer(cache_ref, ctx_id):  # pragma: no cover
+
+def context_finalizer(cache_ref, ctx_id):
     # if the context lives longer than self then remove it
-    # to avoid keeping any refs to the registry
+    # to avoid keeping any refs to the registry, this may run on any thread
+    # so the check and delete must be a single operation
     cache = cache_ref()
-    if cache is not None and ctx_id in cache._contexts:
-        del cache._contexts[ctx_id]
+    if cache is not None:
+        cache._contexts.pop(ctx_id, None)
+
+
+class FrozenFactoryRegistry:
+    """
+    An immutable snapshot of the service factories in an ``AdapterRegistry``.
+
+    Every factory is resolved up front for each interface it provides and
+    each context it was registered for. Lookups walk the resolution order
+    of the context and stop at the first direct match, giving the same
+    answer as the original registry without mutating any internal caches.
+
+    """
+
+    def __init__(self, factories):
+        table = {}
+        for registry in factories.ro:
+            for required, provided, name, _ in registry.allRegistrations():
+                if len(required) != 2 or required[0] is not IServiceFactory:
+                    continue
+                context_iface = required[1]
+                for iface in provided.__iro__:
+                    key = (iface, context_iface, name)
+                    if key in table:
+                        continue
+                    info = _find_factory(factories, iface, context_iface, name)
+                    # only keep factories registered directly for the context,
+                    # less specific ones are found later in the walk
+                    if info is not None and info.context_iface is context_iface:
+                        table[key] = info
+        self._table = table
+
+    def lookup(self, required, provided, name='', default=None):
+        table = self._table
+        for spec in required[1].__sro__:
+            info = table.get((provided, spec, name))
+            if info is not None:
+                return info
+        return default
 
 
 class ServiceContainer:
@@ -130,12 +670,45 @@ class ServiceContainer:
 
     _ServiceCache = ServiceCache  # for testing
 
-    def __init__(self, factories, cache=None, context=None):
-        if cache is None:
-            cache = self._ServiceCache(context)
+    def __init__(
+        self,
+        factories,
+        cache=None,
+        context=None,
+        plans=None,
+        context_cache_size=None,
+        thread_safe=False,
+        template=None,
+    ):
         self._factories = factories
-        self._cache = cache
         self.context = context
+        if cache is not None:
+            self._cache = cache
+        else:
+            # many containers are never used, so the cache is created on the
+            # first access to self._cache, see __getattr__
+            self._plans = plans
+            self._context_cache_size = context_cache_size
+            self._thread_safe = thread_safe
+            self._template = template
+
+    def __getattr__(self, name):
+        # only called when the attribute is missing
+        if name != '_cache':
+            raise AttributeError(
+                f'{type(self).__name__!r} object has no attribute {name!r}'
+            )
+        cache = self._cache = self._create_cache()
+        return cache
+
+    def _create_cache(self):
+        return self._ServiceCache(
+            self.context,
+            self._plans,
+            self._context_cache_size,
+            self._thread_safe,
+            self._template,
+        )
 
     def bind(self, *, context):
         """
@@ -148,6 +721,103 @@ class ServiceContainer:
             factories=self._factories, cache=self._cache, context=context
         )
 
+    def fork(self):
+        """
+        Return a new container sharing the services cached by this one.
+
+        The container is used as a template, see the ``template`` argument
+        to :meth:`.ServiceRegistry.create_container`. The new container is
+        bound to the same :attr:`.context` and has the same options.
+
+        """
+        cache = self._cache
+        return self.__class__(
+            self._factories,
+            context=self.context,
+            plans=cache.registry_plans,
+            context_cache_size=cache.maxsize,
+            thread_safe=cache.thread_safe,
+            template=cache,
+        )
+
+    def context_cache_info(self):
+        """
+        Return statistics about the cache of contexts without weakrefs.
+
+        Contexts such as ``str``, ``int`` and ``tuple`` objects do not support
+        weakrefs and are cached by value, see the ``context_cache_size``
+        argument to :meth:`.ServiceRegistry.create_container`.
+
+        :returns: A named tuple of
+            ``(hits, misses, evictions, maxsize, currsize)``.
+
+        """
+        return self._cache.info()
+
+    def reset(self):
+        """
+        Discard every cached service and any factories or services added
+        directly to the container.
+
+        The container may then be reused for another operation, behaving
+        like a new container from :meth:`.ServiceRegistry.create_container`
+        with the same arguments while reusing its internal structures.
+        Containers bound via :meth:`.bind` share the cache and are reset
+        too.
+
+        Any callbacks added via :meth:`.add_cleanup` are run first, in the
+        reverse order they were added. The cache is reset even if one of
+        them raises an exception.
+
+        """
+        cache = self._cache
+        try:
+            cache.run_cleanups()
+        finally:
+            cache.reset()
+
+    def add_cleanup(self, callback):
+        """
+        Register a callback to run when the container is closed or reset.
+
+        Factories use this to release the resources held by their services,
+        for example closing a database session at the end of a request.
+        Callbacks accept no arguments and are run in the reverse order they
+        were added, so a service is cleaned up before its dependencies.
+
+        """
+        cache = self._cache
+        if cache.closed:
+            raise RuntimeError('the container is closed')
+        if cache.cleanups is None:
+            cache.cleanups = []
+        cache.cleanups.append(callback)
+
+    def close(self):
+        """
+        Run the cleanup callbacks and discard every cached service.
+
+        This is equivalent to :meth:`.reset` but the container cannot be
+        used to create any more services afterward, raising a
+        ``RuntimeError`` instead. Closing a container more than once has no
+        effect.
+
+        Containers also support the context manager protocol, closing the
+        container on exit.
+
+        """
+        cache = self._cache
+        if cache.closed:
+            return
+        cache.closed = True
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
     def get(
         self, iface_or_type=Interface, *, context=_marker, name='', default=_marker
     ):
@@ -175,59 +845,278 @@ class ServiceContainer:
         :param default: A service instance to return if lookup fails.
 
         """
-        if context is not _marker and context is not self.context:
-            proxy = self.bind(context=context)
-            return proxy.get(iface_or_type, name=name, default=default)
+        if context is _marker:
+            context = self.context
 
-        context = self.context
-        iface = _iface_for_type(iface_or_type)
-        context_iface = providedBy(context)
-        cache = self._cache.get(context)
+        while True:
+            context_iface = _none_iface if context is None else providedBy(context)
+            plan_key = (iface_or_type, context_iface, name)
+            cache = self._cache.get(context)
+            inst = cache.hits.get(plan_key, _marker)
+            if inst is not _marker:
+                return inst
+
+            plan = self._cache.plans.get(plan_key)
+            if plan is None:
+                plan = self._compile_plan(plan_key)
+            iface, svc_info = plan
+
+            # skip searching the instances again if nothing has been cached for
+            # this context since the last time the lookup failed
+            misses = cache.misses
+            if plan_key not in misses:
+                inst = cache.lookup(iface, context_iface, name)
+                if inst is not _marker:
+                    cache.hits[plan_key] = inst
+                    return inst
+                misses.add(plan_key)
+
+            if svc_info is None:
+                return self._lookup_failed(plan_key, default)
+
+            if svc_info.wants_context or context is None:
+                break
+
+            # there is no service registered for this context, fallback
+            # to see if there is one registered for context=None by hiding
+            # the current context for the remainder of the lookup
+            context = None
+
+        # only allocate a container bound to the context when the factory
+        # needs one, cached instances are returned above without it
+        if self._cache.closed:
+            raise RuntimeError('the container is closed')
+        container = self if context is self.context else self.bind(context=context)
+        if svc_info.is_async:
+            raise _AsyncFactoryRequired(container, cache, svc_info, plan_key)
+        if svc_info.lifetime == 'transient':
+            return container._call_factory(svc_info, plan_key)
+        if self._cache.thread_safe:
+            return container._create_locked(cache, iface, svc_info, plan_key)
+
+        inst = container._call_factory(svc_info, plan_key)
 
-        inst = cache.lookup(
-            (IServiceInstance, context_iface),
-            iface,
-            name=name,
-            default=_marker,
+        # make sure to register the service using the original, general
+        # context_iface, not the provided one as it may be more specific
+        cache.register(
+            svc_info.service_iface,
+            svc_info.context_iface,
+            name,
+            inst,
+            svc_info.shared,
         )
-        if inst is not _marker:
-            return inst
+        return inst
 
-        svc_info = None
+    def _call_factory(self, svc_info, plan_key):
+        try:
+            return self._invoke(svc_info, plan_key)
+        except _AsyncFactoryRequired:
+            # a dependency of the factory cannot be created synchronously,
+            # this must not be mistaken for the service requested by aget
+            raise RuntimeError(_ASYNC_FACTORY_MESSAGE) from None
+
+    def _create_locked(self, cache, iface, svc_info, plan_key):
+        # only one thread may invoke the factory for a service, any others
+        # wait for it to finish and then find the service in the cache
+        _, context_iface, name = plan_key
+        key = (svc_info.service_iface, svc_info.context_iface, name)
+        with self._cache.lock:
+            locks = cache.locks
+            if locks is None:
+                locks = cache.locks = {}
+            lock = locks.get(key)
+            if lock is None:
+                lock = locks[key] = threading.RLock()
+
+        with lock:
+            inst = cache.lookup(iface, context_iface, name)
+            if inst is _marker:
+                inst = self._call_factory(svc_info, plan_key)
+                cache.register(*key, inst, svc_info.shared)
+        return inst
 
-        # lookup in the local registry if it exists
-        factories = self._cache.find()
-        if factories is not None:
-            svc_info = _find_factory(factories, iface, context_iface, name)
+    async def aget(
+        self, iface_or_type=Interface, *, context=_marker, name='', default=_marker
+    ):
+        """
+        Find a cached instance or create one, awaiting an async factory.
 
-        # lookup in the global registry
-        if svc_info is None:
-            svc_info = _find_factory(self._factories, iface, context_iface, name)
+        Factories defined with ``async def`` can only be created by ``aget``,
+        afterward the instance is cached and also available from :meth:`.get`.
+        Other factories are invoked synchronously, exactly like :meth:`.get`.
 
-        if svc_info is None:
-            if default is not _marker:
-                return default
-            raise LookupError('could not find registered service factory')
+        Concurrent calls for the same service share a single invocation of
+        the factory, which continues even if the callers are cancelled.
 
-        # there is no service registered for this context, fallback
-        # to see if there is one registered for context=None by hiding
-        # the current context for the remainder of the lookup
-        if not svc_info.wants_context and context is not None:
-            proxy = self.bind(context=None)
-            return proxy.get(iface_or_type, name=name, default=default)
+        The arguments are the same as :meth:`.get`.
 
-        inst = svc_info.factory(self)
+        """
+        try:
+            return self.get(iface_or_type, context=context, name=name, default=default)
+        except _AsyncFactoryRequired as exc:
+            return await _await_factory(*exc.args)
 
-        # make sure to register the service using the original, general
-        # context_iface, not the provided one as it may be more specific
-        cache.register(
-            (IServiceInstance, svc_info.context_iface),
-            svc_info.service_iface,
-            name,
-            inst,
-        )
+    async def aget_many(self, ifaces, *, context=_marker, default=_marker):
+        """
+        Find or create several services at once, awaiting async factories.
+
+        Any services which must be created by an async factory are created
+        concurrently, otherwise this is equivalent to :meth:`.get_many`.
+
+        """
+        if context is _marker:
+            context = self.context
+
+        services = []
+        waiting = []
+        for iface_or_type in ifaces:
+            name = ''
+            if type(iface_or_type) is tuple:
+                iface_or_type, name = iface_or_type
+            try:
+                inst = self.get(
+                    iface_or_type, context=context, name=name, default=default
+                )
+            except _AsyncFactoryRequired as exc:
+                inst = None
+                waiting.append((len(services), exc.args))
+            services.append(inst)
+
+        if waiting:
+            # the coroutines are only created once every lookup succeeded,
+            # otherwise they would never be awaited
+            results = await asyncio.gather(
+                *[_await_factory(*args) for _, args in waiting]
+            )
+            for (idx, _), inst in zip(waiting, results):
+                services[idx] = inst
+        return tuple(services)
+
+    async def _acreate(self, cache, pending, svc_info, plan_key, key):
+        try:
+            inst = await self._ainvoke(svc_info, plan_key)
+        finally:
+            pending.pop(key, None)
+        # the caller still gets the instance if the container was reset or
+        # closed in the meantime, but it is not cached for the next operation
+        if cache.pending is pending:
+            cache.register(*key, inst)
         return inst
 
+    def get_many(self, ifaces, *, context=_marker, default=_marker):
+        """
+        Find or create several services at once.
+
+        This is equivalent to calling :meth:`.get` for each item, but the work
+        derived from the context is shared by all of the lookups.
+
+        .. code-block:: python
+
+            db, cache, login = container.get_many(
+                [DbSession, ICache, (LoginService, 'login')]
+            )
+
+        :param ifaces: A sequence of the ``iface_or_type`` to look up or
+            ``(iface_or_type, name)`` tuples for named services.
+        :param context: A context object, as in :meth:`.get`.
+        :param default: A service instance to return for any lookup which
+            fails.
+        :returns: A tuple of the services in the same order as ``ifaces``.
+
+        """
+        if context is _marker:
+            context = self.context
+        context_iface = _none_iface if context is None else providedBy(context)
+        hits = self._cache.get(context).hits
+
+        services = []
+        for iface_or_type in ifaces:
+            name = ''
+            if type(iface_or_type) is tuple:
+                iface_or_type, name = iface_or_type
+            inst = hits.get((iface_or_type, context_iface, name), _marker)
+            if inst is _marker:
+                inst = self.get(
+                    iface_or_type, context=context, name=name, default=default
+                )
+            services.append(inst)
+        return tuple(services)
+
+    def resolver(
+        self, iface_or_type=Interface, *, context=_marker, name='', default=_marker
+    ):
+        """
+        Return a callable which looks up a service in this container.
+
+        The arguments are the same as :meth:`.get`, see
+        :meth:`.ServiceRegistry.resolver` for more information. Calling
+        ``resolver()`` returns the same service as ``container.get(...)``.
+
+        """
+        resolve = _make_resolver(iface_or_type, context, name, default)
+        if context is _marker:
+            context = self.context
+
+        # contexts which can be evicted from the cache must be found again
+        # on every lookup, others live as long as the resolver refers to them
+        cache = self._cache
+        ctx_cache = cache.get(context)
+        if context is not None and cache._contexts.get(id(context)) is not ctx_cache:
+            return lambda: resolve(self)
+
+        hits = ctx_cache.hits
+        context_iface = _none_iface if context is None else providedBy(context)
+        plan_key = (iface_or_type, context_iface, name)
+
+        def resolver():
+            inst = hits.get(plan_key, _marker)
+            if inst is not _marker:
+                return inst
+            return self.get(iface_or_type, context=context, name=name, default=default)
+
+        return resolver
+
+    def _invoke(self, svc_info, plan_key):
+        return svc_info.factory(self)
+
+    async def _ainvoke(self, svc_info, plan_key):
+        return await svc_info.factory(self)
+
+    def _lookup_failed(self, plan_key, default):
+        if default is not _marker:
+            return default
+        raise LookupError('could not find registered service factory')
+
+    def _compile_plan(self, plan_key):
+        """
+        Resolve the interface and factory for a lookup and memoize the result.
+
+        The plan depends only on the registrations, not on the container, so
+        it is shared by every container created from the same registry until
+        a new factory is registered.
+
+        """
+        iface_or_type, context_iface, name = plan_key
+        iface = _iface_for_type(iface_or_type)
+
+        # lookup in the local registry if it exists, these plans are only
+        # valid for the current container and must not leak into the registry
+        cache = self._cache
+        if cache.factories is not None:
+            svc_info = _find_factory(cache.factories, iface, context_iface, name)
+            if svc_info is not None:
+                plan = cache.plans[plan_key] = (iface, svc_info)
+                return plan
+
+            plan = cache.registry_plans.get(plan_key)
+            if plan is not None:
+                return plan
+
+        # lookup in the global registry
+        svc_info = _find_factory(self._factories, iface, context_iface, name)
+        plan = cache.registry_plans[plan_key] = (iface, svc_info)
+        return plan
+
     def set(self, service, iface_or_type=Interface, *, context=_marker, name=''):
         """
         Add a service instance to the container.
@@ -253,22 +1142,23 @@ class ServiceContainer:
         iface = _iface_for_type(iface_or_type)
         context_iface = providedBy(context)
         cache = self._cache.get(context)
-        inst = cache.lookup(
-            (IServiceInstance, context_iface),
-            iface,
-            name=name,
-            default=_marker,
-        )
+        inst = cache.lookup(iface, context_iface, name)
         if inst is not _marker:
             raise ValueError(
                 'a service instance is already cached that would conflict '
                 'with this registration'
             )
 
-        cache.register((IServiceInstance, context_iface), iface, name, service)
+        cache.register(iface, context_iface, name, service)
 
     def register_factory(
-        self, factory, iface_or_type=Interface, *, context=None, name=''
+        self,
+        factory,
+        iface_or_type=Interface,
+        *,
+        context=None,
+        name='',
+        lifetime='container',
     ):
         """
         Register a service factory.
@@ -282,9 +1172,15 @@ class ServiceContainer:
         context_iface = _iface_for_context(context)
         wants_context = context is not None
 
-        info = ServiceFactoryInfo(factory, iface, context_iface, wants_context)
-        factories = self._cache.get()
-        _register_factory(info, factories, iface, context_iface, name)
+        info = ServiceFactoryInfo(
+            factory, iface, context_iface, wants_context, lifetime
+        )
+        cache = self._cache
+        _register_factory(info, cache.own_factories(), iface, context_iface, name)
+
+        # start over with a fresh set of local plans, any lookups made on the
+        # registry's plans are still valid and will be used as a fallback
+        cache.plans = {}
 
     def register_singleton(
         self, service, iface_or_type=Interface, *, context=None, name=''
@@ -304,6 +1200,134 @@ class ServiceContainer:
         )
 
 
+class ServiceHook:
+    """
+    A base class for observing how a container resolves services.
+
+    Install a hook with :meth:`.ServiceRegistry.add_hook`. Every method is a
+    no-op by default, override the ones of interest. Each method receives the
+    container making the lookup as well as the requested ``iface_or_type``
+    and ``name``.
+
+    """
+
+    def cache_hit(self, container, iface_or_type, name, service):
+        """A cached ``service`` was returned."""
+
+    def cache_miss(self, container, iface_or_type, name):
+        """No cached service was found and a factory will be invoked."""
+
+    def factory_start(self, container, iface_or_type, name, factory):
+        """The ``factory`` is about to be invoked."""
+
+    def factory_end(self, container, iface_or_type, name, service, duration):
+        """
+        The factory returned, taking ``duration`` seconds.
+
+        ``service`` is ``None`` if the factory raised an exception.
+
+        """
+
+    def lookup_failed(self, container, iface_or_type, name):
+        """No factory was registered for the lookup."""
+
+
+class _HookState(threading.local):
+    # the number of events emitted in the current thread, a lookup which
+    # did not emit any events itself was answered from the cache
+    events = 0
+
+
+class _UnmemoizedHits(dict):
+    def __setitem__(self, key, value):
+        pass
+
+
+class _InstrumentedContextCache(ContextCache):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__()
+        # every lookup must go through get in order to be reported, rather
+        # than being answered directly from the memo by a resolver
+        self.hits = _UnmemoizedHits()
+
+
+class InstrumentedServiceContainer(ServiceContainer):
+    """
+    A :class:`.ServiceContainer` which reports lookups to a set of hooks.
+
+    This is created by :meth:`.ServiceRegistry.create_container` when hooks
+    are installed, keeping the overhead out of uninstrumented containers.
+
+    """
+
+    def __init__(self, factories, cache=None, context=None, hooks=None, **kw):
+        self._hooks = hooks
+        super().__init__(factories, cache, context, **kw)
+
+    def _create_cache(self):
+        cache = super()._create_cache()
+        if self._hooks is not None:
+            cache.hooks = self._hooks
+            cache.hook_state = _HookState()
+            cache._ContextCache = _InstrumentedContextCache
+        return cache
+
+    def fork(self):
+        child = super().fork()
+        child._hooks = getattr(self._cache, 'hooks', None)
+        return child
+
+    def get(
+        self, iface_or_type=Interface, *, context=_marker, name='', default=_marker
+    ):
+        state = self._cache.hook_state
+        events = state.events
+        inst = super().get(iface_or_type, context=context, name=name, default=default)
+        # any other outcome, such as invoking a factory, emits its own events
+        if state.events == events:
+            self._emit('cache_hit', iface_or_type, name, inst)
+        return inst
+
+    def _invoke(self, svc_info, plan_key):
+        iface_or_type, _, name = plan_key
+        self._emit('cache_miss', iface_or_type, name)
+        self._emit('factory_start', iface_or_type, name, svc_info.factory)
+        inst = None
+        start = time.perf_counter()
+        try:
+            inst = svc_info.factory(self)
+        finally:
+            duration = time.perf_counter() - start
+            self._emit('factory_end', iface_or_type, name, inst, duration)
+        return inst
+
+    async def _ainvoke(self, svc_info, plan_key):
+        iface_or_type, _, name = plan_key
+        self._emit('cache_miss', iface_or_type, name)
+        self._emit('factory_start', iface_or_type, name, svc_info.factory)
+        inst = None
+        start = time.perf_counter()
+        try:
+            inst = await svc_info.factory(self)
+        finally:
+            duration = time.perf_counter() - start
+            self._emit('factory_end', iface_or_type, name, inst, duration)
+        return inst
+
+    def _lookup_failed(self, plan_key, default):
+        iface_or_type, _, name = plan_key
+        self._emit('lookup_failed', iface_or_type, name)
+        return super()._lookup_failed(plan_key, default)
+
+    def _emit(self, event, *args):
+        cache = self._cache
+        cache.hook_state.events += 1
+        for hook in cache.hooks:
+            getattr(hook, event)(self, *args)
+
+
 class ServiceRegistry:
     """
     A service registry contains service factory definitions.
@@ -323,13 +1347,27 @@ class ServiceRegistry:
 
     _AdapterRegistry = AdapterRegistry  # for testing
     _ServiceContainer = ServiceContainer  # for testing
+    _InstrumentedServiceContainer = InstrumentedServiceContainer  # for testing
 
     def __init__(self, factory_registry=None):
         if factory_registry is None:
             factory_registry = self._AdapterRegistry()
         self._factories = factory_registry
+        self._plans = {}
+        self._frozen = False
+
+        # drop the plans whenever the factories change other than via
+        # register_factory, for example in a base registry
+        self._plan_invalidator = _PlanInvalidator(factory_registry, self._plans)
+        factory_registry.changed = self._plan_invalidator
+        self._hooks = []
 
-    def create_container(self, *, context=None):
+        # factories registered within a batch, see batch()
+        self._pending = None
+
+    def create_container(
+        self, *, context=None, context_cache_size=None, thread_safe=False, template=None
+    ):
         """
         Create a new :class:`.ServiceContainer` linked to the registry.
 
@@ -344,12 +1382,163 @@ class ServiceRegistry:
         :param context: The container will be bound to a different context
             object, affecting which factories are selected. By default,
             the container is bound to the ``None`` context.
+        :param int context_cache_size: The maximum number of contexts which
+            do not support weakrefs, such as ``str`` or ``int`` objects, to
+            cache services for. These contexts are keyed by value and the
+            least recently used are evicted, dropping their cached services.
+            By default, the cache is unbounded and lives as long as the
+            container.
+        :param bool thread_safe: Allow the container to be shared between
+            threads. Each service is then created exactly once per context,
+            other threads asking for it wait until the factory returns.
+            Services which are already cached are still returned without
+            locking.
+        :param template: A container created by this registry whose cached
+            services are shared with the new container. This is useful to
+            prepare the services which do not depend on the operation once,
+            rather than creating them again in every container. Any services
+            created afterward by the new container are only cached in the new
+            container, and factories or services added directly to the
+            template are also available. Services checked out from a pool,
+            see :meth:`.register_pooled`, are not shared and the new
+            container checks out its own. The template should not be changed
+            once it is used. See also :meth:`.ServiceContainer.fork`.
+
+        """
+        if template is not None:
+            template = template._cache
+            if template.registry_plans is not self._plans:
+                raise ValueError(
+                    'the template must be a container created by this registry'
+                )
+        if self._hooks:
+            return self._InstrumentedServiceContainer(
+                self._factories,
+                context=context,
+                plans=self._plans,
+                context_cache_size=context_cache_size,
+                thread_safe=thread_safe,
+                template=template,
+                hooks=tuple(self._hooks),
+            )
+        return self._ServiceContainer(
+            self._factories,
+            context=context,
+            plans=self._plans,
+            context_cache_size=context_cache_size,
+            thread_safe=thread_safe,
+            template=template,
+        )
 
+    def resolver(
+        self, iface_or_type=Interface, *, context=_marker, name='', default=_marker
+    ):
         """
-        return self._ServiceContainer(self._factories, context=context)
+        Return a handle for looking up a service in a container.
+
+        The handle is called with a container, ``resolver(container)``, and
+        returns the same service as ``container.get(...)``. The arguments are
+        validated up front and a cached service is returned without going
+        through the rest of :meth:`.ServiceContainer.get`, which makes them
+        useful at call sites performing many lookups.
+
+        .. code-block:: python
+
+            get_dbsession = registry.resolver(DbSession)
+
+            for request in requests:
+                dbsession = get_dbsession(request.container)
+
+        :param iface_or_type: A class or ``zope.interface.Interface`` object
+            defining the interface of the service.
+        :param context: A context object used instead of the bound
+            :attr:`.ServiceContainer.context` on the container.
+        :param str name: The registered name of the service.
+        :param default: A service instance to return if lookup fails.
+
+        """
+        return _make_resolver(iface_or_type, context, name, default)
+
+    def add_hook(self, hook):
+        """
+        Install a hook to observe service lookups.
+
+        ``hook`` should implement the methods of :class:`.ServiceHook` which
+        is a convenient base class. Only containers created after the hook is
+        installed will report to it, containers created while no hooks are
+        installed pay no extra cost.
+
+        """
+        self._hooks.append(hook)
+
+    @contextmanager
+    def batch(self):
+        """
+        Register many factories at once.
+
+        Within the ``with`` block, calls to :meth:`.register_factory` and
+        :meth:`.register_singleton` are collected and committed together when
+        the block exits, which is much faster than registering each one
+        separately when there are thousands of them. If the block raises an
+        exception then none of the factories are registered.
+
+        .. code-block:: python
+
+            with registry.batch():
+                for plugin in plugins:
+                    registry.register_factory(plugin.factory, plugin.iface)
+
+        The factories are not visible to :meth:`.find_factory` or any
+        containers until the block exits. Nested batches are committed with
+        the outermost one.
+
+        """
+        if self._frozen:
+            raise RuntimeError('cannot register a factory on a frozen registry')
+        if self._pending is not None:
+            yield
+            return
+
+        self._pending = pending = []
+        try:
+            yield
+        finally:
+            self._pending = None
+
+        if pending:
+            _register_factories(self._factories, pending)
+            self._plans.clear()
+
+    def freeze(self):
+        """
+        Prevent any further changes to the registry.
+
+        The registered factories are compiled into a read-only dispatch table
+        which is used by any containers created afterward. The table never
+        changes so it is safe to share between threads. Calling
+        :meth:`.register_factory` or :meth:`.register_singleton` on a frozen
+        registry will raise a ``RuntimeError``. The registry cannot be
+        frozen within :meth:`.batch`.
+
+        Factories registered directly on a container via
+        :meth:`.ServiceContainer.register_factory` are still supported.
+
+        """
+        if self._frozen:
+            return
+        if self._pending is not None:
+            raise RuntimeError('cannot freeze a registry within a batch')
+        self._factories = FrozenFactoryRegistry(self._factories)
+        self._frozen = True
 
     def register_factory(
-        self, factory, iface_or_type=Interface, *, context=None, name=''
+        self,
+        factory,
+        iface_or_type=Interface,
+        *,
+        context=None,
+        name='',
+        lifetime='container',
     ):
         """
         Register a service factory.
@@ -386,7 +1575,9 @@ class ServiceRegistry:
 
         :param factory: A factory is a callable that accepts a container
             argument and returns an instance of the service. Specifically,
-            ``factory(services: ServiceContainer) -> iface``.
+            ``factory(services: ServiceContainer) -> iface``. An
+            ``async def`` factory is awaited by
+            :meth:`.ServiceContainer.aget`.
         :param iface_or_type: A class or ``zope.interface.Interface`` object
             defining the interface of the service. Defaults to
             ``zope.interface.Interface`` to match any requested interface.
@@ -396,14 +1587,44 @@ class ServiceRegistry:
         :param str name: An identifier for the service. A factory can be
             registered for an ``iface_or_type`` or a ``name`` or both, but an
             ``iface_or_type`` is recommended for most services.
+        :param str lifetime: Controls how long the service instance is
+            reused. The default, ``'container'``, invokes the factory at most
+            once per container. A ``'singleton'`` invokes the factory the
+            first time the service is requested from any container, and
+            shares the instance with every container created from this
+            registry. Concurrent requests from multiple threads will wait for
+            one invocation of the factory to complete. The factory should not
+            depend on the ``context`` or any other per-container services.
+            A ``'transient'`` factory is invoked every time the service is
+            requested and the result is never cached.
 
         """
+        if self._frozen:
+            raise RuntimeError('cannot register a factory on a frozen registry')
+
         iface = _iface_for_type(iface_or_type)
         context_iface = _iface_for_context(context)
         wants_context = context is not None
 
-        info = ServiceFactoryInfo(factory, iface, context_iface, wants_context)
-        _register_factory(info, self._factories, iface, context_iface, name)
+        info = ServiceFactoryInfo(
+            factory, iface, context_iface, wants_context, lifetime
+        )
+        if self._pending is not None:
+            self._pending.append((info, iface, context_iface, name))
+            return
+
+        provided = getattr(self._factories, '_provided', None)
+        reordered = provided is None or iface not in provided
+        invalidator = self._plan_invalidator
+        invalidator.expected = True
+        try:
+            _register_factory(info, self._factories, iface, context_iface, name)
+        finally:
+            invalidator.expected = False
+
+        # drop the memoized lookup plans affected by the new factory in-place
+        # as the dict is shared by all of the containers
+        _invalidate_plans(self._plans, iface, context_iface, name, reordered)
 
     def register_singleton(
         self, service, iface_or_type=Interface, *, context=None, name=''
@@ -424,6 +1645,44 @@ class ServiceRegistry:
             service_factory, iface_or_type, context=context, name=name
         )
 
+    def register_pooled(
+        self,
+        factory,
+        iface_or_type=Interface,
+        *,
+        context=None,
+        name='',
+        maxsize=10,
+        timeout=None,
+    ):
+        """
+        Register a factory for services which are checked out from a pool.
+
+        The registry owns a :class:`wired.container.ServicePool` of at most
+        ``maxsize`` instances created by ``factory``. Each container checks
+        out an instance the first time the service is requested, and returns
+        it to the pool when the container is closed or reset. Containers
+        using pooled services should therefore be closed, see
+        :meth:`.ServiceContainer.close`, otherwise the instance is only
+        returned once the container is garbage collected.
+
+        Pooled instances outlive the container passed to ``factory`` and
+        should not keep a reference to it. See :meth:`.register_factory` for
+        information on the other parameters.
+
+        :param int maxsize: The maximum number of instances in the pool.
+        :param float timeout: The number of seconds to wait for an instance
+            when every instance is checked out, after which the lookup raises
+            a ``TimeoutError``. By default, the lookup waits indefinitely.
+        :returns: The :class:`wired.container.ServicePool`, which reports the
+            utilization of the pool via
+            :meth:`wired.container.ServicePool.info`.
+
+        """
+        pool = ServicePool(factory, maxsize, timeout)
+        self.register_factory(pool, iface_or_type, context=context, name=name)
+        return pool
+
     def find_factory(self, iface_or_type=Interface, *, context=None, name=''):
         """
         Return the factory registered for the given parameters.
@@ -442,16 +1701,183 @@ class ServiceRegistry:
             return svc_info.factory
 
 
+async def _await_factory(container, cache, svc_info, plan_key):
+    if svc_info.lifetime == 'transient':
+        return await container._ainvoke(svc_info, plan_key)
+
+    key = (svc_info.service_iface, svc_info.context_iface, plan_key[2])
+    pending = cache.pending
+    if pending is None:
+        pending = cache.pending = {}
+    task = pending.get(key)
+    if task is None:
+        task = pending[key] = asyncio.ensure_future(
+            container._acreate(cache, pending, svc_info, plan_key, key)
+        )
+    return await asyncio.shield(task)
+
+
+def _make_resolver(iface_or_type, context, name, default):
+    # fail early on an invalid type instead of at the call site
+    _iface_for_type(iface_or_type)
+    none_key = (iface_or_type, _none_iface, name)
+
+    def resolver(container):
+        ctx = container.context if context is _marker else context
+        if ctx is None:
+            plan_key = none_key
+        else:
+            plan_key = (iface_or_type, providedBy(ctx), name)
+
+        # an instrumented container never memoizes its hits so they are
+        # reported by get, see InstrumentedServiceContainer
+        inst = container._cache.get(ctx).hits.get(plan_key, _marker)
+        if inst is not _marker:
+            return inst
+        return container.get(iface_or_type, context=ctx, name=name, default=default)
+
+    return resolver
+
+
 def _register_factory(info, factories, iface, context_iface, name):
     factories.register((IServiceFactory, context_iface), iface, name, info)
 
 
-def _find_factory(factories, iface, context_iface, name):
-    return factories.lookup(
-        (IServiceFactory, context_iface), iface, name=name, default=None
+def _register_factories(factories, entries):
+    # registering a factory for a new interface inserts it into the ordered
+    # list of extendors for each of its bases, rebuilding lists which grow
+    # with every registration. Bump the counts of new interfaces up front so
+    # the AdapterRegistry skips that step, then add them all in one pass.
+    # This relies on zope.interface internals, if they are missing then
+    # register each factory separately.
+    provided = getattr(factories, '_provided', None)
+    lookup = getattr(factories, '_v_lookup', None)
+    if not isinstance(provided, dict) or not isinstance(
+        getattr(lookup, '_extendors', None), dict
+    ):
+        for info, iface, context_iface, name in entries:
+            _register_factory(info, factories, iface, context_iface, name)
+        return
+
+    added = []
+    for _, iface, _, _ in entries:
+        if iface not in provided:
+            provided[iface] = 1
+            added.append(iface)
+
+    # the registry also clears its lookup caches after every registration,
+    # which only needs to happen once at the end
+    changed = factories.changed
+    factories.changed = _defer_changed
+    try:
+        for info, iface, context_iface, name in entries:
+            _register_factory(info, factories, iface, context_iface, name)
+    finally:
+        factories.changed = changed
+        for iface in added:
+            provided[iface] -= 1
+            if not provided[iface]:
+                del provided[iface]
+        added = [iface for iface in added if iface in provided]
+        _add_extendors(lookup._extendors, added)
+        factories.changed(factories)
+
+
+def _defer_changed(originally_changed):
+    pass
+
+
+def _add_extendors(extendors, added):
+    # equivalent to AdapterLookup.add_extendor for each interface in turn,
+    # which puts the new interface after any of the extendors it extends
+    # and before the rest. The lists are built in reverse, such that the
+    # common case of an unrelated interface is an append.
+    by_base = {}
+    for iface in added:
+        for base in iface.__iro__:
+            by_base.setdefault(base, []).append(iface)
+
+    for base, ifaces in by_base.items():
+        current = extendors.get(base, ())
+        members = set(current)
+        reverse = list(reversed(current))
+        for iface in ifaces:
+            extended = {e for e in iface.__iro__ if e in members}
+            moved = []
+            while len(moved) < len(extended) and reverse[-1] in extended:
+                moved.append(reverse.pop())
+            if len(moved) < len(extended):
+                reverse.extend(reversed(moved))
+                moved = [e for e in reversed(reverse) if e in extended]
+                reverse = [e for e in reverse if e not in extended]
+            reverse.append(iface)
+            reverse.extend(reversed(moved))
+            members.add(iface)
+        extendors[base] = list(reversed(reverse))
+
+
+class _PlanInvalidator:
+    """
+    Replaces ``changed`` on a factory registry to clear the lookup plans.
+
+    An ``AdapterRegistry`` calls ``changed`` after every registration, and
+    passes it on to its subregistries when one of its bases changes. The
+    plans are dropped selectively by :meth:`.ServiceRegistry.register_factory`
+    instead, which sets :attr:`expected` while it registers the factory.
+
+    """
+
+    def __init__(self, factories, plans):
+        self.changed = factories.changed
+        self.plans = plans
+        self.expected = False
+
+    def __call__(self, originally_changed):
+        self.changed(originally_changed)
+        if not self.expected:
+            self.plans.clear()
+
+
+def _invalidate_plans(plans, iface, context_iface, name, reordered):
+    # a factory satisfies lookups for any interface it extends made with
+    # a context which extends the one it was registered for, every other
+    # plan, including failed lookups, is still valid. The first factory for
+    # an interface also reorders the candidates for each interface it
+    # extends, which affects lookups with any context or name.
+    for plan_key, (plan_iface, _) in list(plans.items()):
+        if iface.isOrExtends(plan_iface) and (
+            reordered
+            or (plan_key[2] == name and plan_key[1].isOrExtends(context_iface))
+        ):
+            plans.pop(plan_key, None)
+
+
+def _is_async_factory(factory):
+    return inspect.iscoroutinefunction(factory) or inspect.iscoroutinefunction(
+        getattr(factory, '__call__', None)
     )
 
 
+def _discard_registry(registry):
+    # an AdapterRegistry refers to itself through its lookup object and the
+    # methods delegated to it, break the cycle so that it is freed by
+    # reference counting instead of waiting for the cyclic gc
+    registry.__dict__.clear()
+
+
+def _find_factory(factories, iface, context_iface, name):
+    if isinstance(factories, FrozenFactoryRegistry):
+        return factories.lookup(
+            (IServiceFactory, context_iface), iface, name=name, default=None
+        )
+
+    # an AdapterRegistry populates its lookup caches as a side effect
+    with _lookup_lock:
+        return factories.lookup(
+            (IServiceFactory, context_iface), iface, name=name, default=None
+        )
+
+
 def _iface_for_type(obj):
     # if the object is an interface then we can quit early
     if IInterface.providedBy(obj):
@@ -83,10 +83,13 @@ class factory:
 
     """
 
-    def __init__(self, for_=None, context=None, name: str = ''):
+    def __init__(
+        self, for_=None, context=None, name: str = '', lifetime: str = 'container'
+    ):
         self.for_ = for_
         self.context = context
         self.name = name
+        self.lifetime = lifetime
 
     def __call__(self, wrapped):
         def callback(scanner: Scanner, name: str, cls):
@@ -95,7 +98,12 @@ class factory:
             # class as the instance
             for_ = self.for_ if self.for_ else cls
             register_dataclass(
-                registry, cls, for_=for_, context=self.context, name=self.name
+                registry,
+                cls,
+                for_=for_,
+                context=self.context,
+                name=self.name,
+                lifetime=self.lifetime,
             )
 
         attach(wrapped, callback, category='wired')
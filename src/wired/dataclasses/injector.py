@@ -1,9 +1,15 @@
-from dataclasses import MISSING, Field, dataclass, fields
-from typing import get_type_hints
+import asyncio
+from dataclasses import MISSING, Field, dataclass, field, fields
+import keyword
+from typing import Callable, get_type_hints
 
 from wired import ServiceContainer
+from wired.container import _AsyncFactoryRequired, _iface_for_type
 from wired.dataclasses.models import Context
 
+# Returned by a step when the field should not be passed to the target
+_skip = object()
+
 
 @dataclass()
 class Injector:
@@ -14,95 +20,366 @@ class Injector:
     # is implemented as hasattr(obj, dataclasses._FIELDS)
     target: type
 
-    # XXX potentially define a __post_init__ here to process the target
-    # to reduce the work done in __call__
+    # Generate a specialized factory function for the target, rather than
+    # interpreting the plan on every call
+    codegen: bool = False
+
+    # The target is introspected on the first call, and compiled into a
+    # list of (field_name, step) pairs where each step is a small function
+    # accepting (container, context) and returning the field value
+    plan: list = field(default=None, init=False, repr=False, compare=False)
+
+    # The generated factory if codegen is enabled
+    factory: Callable = field(default=None, init=False, repr=False, compare=False)
 
     def __call__(self, container):
-        target = self.target
+        if self.codegen:
+            factory = self.factory
+            if factory is None:
+                factory = self.factory = self.generate()
+            return factory(container)
+
+        plan = self.plan
+        if plan is None:
+            plan = self.plan = self.compile()
+
         context = container.context
 
         # Make the args dict that we will construct dataclass with
         args = {}
+        for field_name, step in plan:
+            field_value = step(container, context)
+            if field_value is not _skip:
+                args[field_name] = field_value
 
-        # Iterate through the dataclass fields
-        # Because fields() gives a string for the type, instead of the
-        # actual type, let's get a mapping of field name -> field type
-        fields_mapping = {f.name: f for f in fields(target)}
-
-        # Iterate through the dataclass fields
-        for field_name, field_type in get_type_hints(target).items():
-            # Doing this style of bailing out quickly for performance
-            # reasons. Don't want to keep doing "if", though it
-            # means some repetitions.
-            if field_type is ServiceContainer:
-                args[field_name] = container
-                continue
+        # Now construct an instance of the target dataclass
+        return self.target(**args)
 
-            if field_type == Context:
-                args[field_name] = context
-                continue
+    def compile(self):
+        return [
+            (field_name, _make_step(kind, info))
+            for field_name, kind, info in _analyze(self.target)
+        ]
 
-            # See if this field is using the injectable field, e.g.
-            # url: str = injected(Url, attr='value')
-            full_field: Field = fields_mapping[field_name]
-            if full_field.metadata.get('injected', False):
-                injected_info = full_field.metadata['injected']
-                injected_attr = injected_info.get('attr')
-                injected_type = injected_info['type_']
-                injected_name = injected_info['name']
-
-                # Another special case: if asked to inject Context or
-                # ServiceContainer, consider it like a sentinel and return it.
+    def generate(self):
+        """
+        Generate a factory function specialized for the target.
+
+        Similar to how :mod:`dataclasses` generates ``__init__``, this builds
+        the source of a function that makes each ``container.get`` call in
+        sequence and passes the results directly to the target.
+
+        """
+        target = self.target
+        namespace = {'_target': target, '_skip': _skip}
+        body = ['    context = container.context']
+        args = []
+        optional = []
+        for idx, (field_name, kind, info) in enumerate(_analyze(target)):
+            var = f'_v{idx}'
+            if kind == 'container':
+                var = 'container'
+            elif kind == 'context':
+                var = 'context'
+            elif kind == 'injected':
+                injected_type, injected_name, injected_attr = info
                 if injected_type is Context:
-                    injected_target = context
+                    expr = 'context'
                 elif injected_type is ServiceContainer:
-                    injected_target = container
+                    expr = 'container'
                 else:
-                    # Ask the registry for one of these
-                    injected_target = container.get(injected_type, name=injected_name)
-
-                # If attr is used, get specified attribute off that instance
+                    namespace[f'_t{idx}'] = injected_type
+                    namespace[f'_n{idx}'] = injected_name
+                    expr = f'container.get(_t{idx}, name=_n{idx})'
                 if injected_attr:
-                    field_value = getattr(injected_target, injected_attr)
-                else:
-                    field_value = injected_target
-                args[field_name] = field_value
+                    if injected_attr.isidentifier() and not keyword.iskeyword(
+                        injected_attr
+                    ):
+                        expr = f'{expr}.{injected_attr}'
+                    else:
+                        namespace[f'_a{idx}'] = injected_attr
+                        expr = f'getattr({expr}, _a{idx})'
+                body.append(f'    {var} = {expr}')
+            elif kind == 'service':
+                _, _, field_type, on_error = info
+                namespace[f'_t{idx}'] = field_type
+                namespace[f'_e{idx}'] = on_error
+                body.extend(
+                    [
+                        '    try:',
+                        f'        {var} = container.get(_t{idx})',
+                        '    except (TypeError, LookupError) as exc:',
+                        f'        {var} = _e{idx}(container, context, exc)',
+                    ]
+                )
+                if on_error.may_skip:
+                    optional.append((field_name, var))
+                    continue
+            elif kind == 'default':
+                namespace[f'_d{idx}'] = info[0]
+                var = f'_d{idx}'
+            else:  # missing
+                namespace[f'_m{idx}'] = info[0]
+                body.append(f'    {var} = _m{idx}(container, context)')
+                optional.append((field_name, var))
                 continue
+            args.append((field_name, var))
+
+        # keyword-only fields, added in Python 3.10, cannot be positional
+        init_fields = [f for f in fields(target) if f.init]
+        if (
+            not optional
+            and [name for name, _ in args] == [f.name for f in init_fields]
+            and not any(getattr(f, 'kw_only', False) for f in init_fields)
+        ):
+            call_args = [var for _, var in args]
+        else:
+            call_args = [f'{name}={var}' for name, var in args]
+        if optional:
+            body.append('    kwargs = {}')
+            for field_name, var in optional:
+                body.append(f'    if {var} is not _skip:')
+                body.append(f'        kwargs[{field_name!r}] = {var}')
+            call_args.append('**kwargs')
+        body.append(f'    return _target({", ".join(call_args)})')
+
+        source = '\n'.join(['def factory(container):'] + body)
+        exec(source, namespace)
+        factory = namespace['factory']
+        factory.__qualname__ = f'{target.__qualname__}.__wired_factory__'
+        return factory
 
-            # Now the general case, something like url: Url
+
+@dataclass()
+class AsyncInjector(Injector):
+    """
+    Introspect dataclass and get arguments from container, concurrently
+    awaiting any services which must be created by async factories.
+
+    """
+
+    async def __call__(self, container):
+        plan = self.plan
+        if plan is None:
+            plan = self.plan = self.compile()
+
+        context = container.context
+
+        # Get every field that is available synchronously, deferring the
+        # services from async factories to create them all at once
+        args = {}
+        waiting = []
+        for field_name, step, async_step in plan:
             try:
-                field_value = container.get(field_type)
+                field_value = step(container, context)
+            except _AsyncFactoryRequired:
+                waiting.append((field_name, async_step))
+                continue
+            if field_value is not _skip:
                 args[field_name] = field_value
-            except TypeError:
-                # Seems that wired, when looking up str, gives:
-                #   TypeError: can't set attributes of bui...sion type 'str'
-                # We will use that to our advantage to look for a dataclass
-                # field default value.
-                field_default = getattr(full_field, 'default', None)
-                if field_default is not MISSING:
-                    args[field_name] = field_default
-                    continue
-                elif full_field.init is False:
-                    # Expect a __post_init__ that assigns this value
-                    if not hasattr(target, '__post_init__'):
-                        m = 'has init=False but no __post_init__'
-                        msg = f'Field "{field_name}" {m}'
-                        raise LookupError(msg)
-                    continue
-                else:
-                    msg = f'No default value on field {field_name}'
-                    raise LookupError(msg)
-            except LookupError:
-                # Give up and work around ``wired`` unhelpful exception
-                # by adding some context information.
-
-                # Note that a dataclass with ``__post_init__`` might still
-                # do some construction. Only do this next part if there's
-                # no __post_init__
-                if not hasattr(target, '__post_init__'):
-                    m = 'Injector failed for'
-                    msg = f'{m} {field_name} on {target.__name__}'
-                    raise LookupError(msg)
 
-        # Now construct an instance of the target dataclass
-        return target(**args)
+        if waiting:
+            values = await asyncio.gather(
+                *[async_step(container, context) for _, async_step in waiting]
+            )
+            for (field_name, _), field_value in zip(waiting, values):
+                if field_value is not _skip:
+                    args[field_name] = field_value
+
+        return self.target(**args)
+
+    def compile(self):
+        plan = []
+        for field_name, kind, info in _analyze(self.target):
+            # only lookups may need to await a service
+            async_step = None
+            if kind == 'injected':
+                async_step = _async_injected_step(*info)
+            elif kind == 'service':
+                async_step = _async_service_step(*info)
+            plan.append((field_name, _make_step(kind, info), async_step))
+        return plan
+
+
+def _analyze(target):
+    """
+    Yield ``(field_name, kind, info)`` describing how to populate each field.
+
+    """
+    # Because fields() gives a string for the type, instead of the
+    # actual type, let's get a mapping of field name -> field type
+    fields_mapping = {f.name: f for f in fields(target)}
+
+    # Iterate through the dataclass fields
+    for field_name, field_type in get_type_hints(target).items():
+        if field_type is ServiceContainer:
+            yield field_name, 'container', ()
+            continue
+
+        if field_type == Context:
+            yield field_name, 'context', ()
+            continue
+
+        # See if this field is using the injectable field, e.g.
+        # url: str = injected(Url, attr='value')
+        full_field: Field = fields_mapping[field_name]
+        if full_field.metadata.get('injected', False):
+            injected_info = full_field.metadata['injected']
+            info = (
+                injected_info['type_'],
+                injected_info['name'],
+                injected_info.get('attr'),
+            )
+            yield field_name, 'injected', info
+            continue
+
+        # Now the general case, something like url: Url
+        if _is_service_type(field_type):
+            on_error = _service_error(target, field_name, full_field)
+            yield field_name, 'service', (target, field_name, field_type, on_error)
+            continue
+
+        field_default = getattr(full_field, 'default', None)
+        if field_default is not MISSING:
+            yield field_name, 'default', (field_default,)
+        else:
+            step = _missing_step(target, field_name, full_field)
+            yield field_name, 'missing', (step,)
+
+
+def _make_step(kind, info):
+    if kind == 'container':
+        return _container_step
+    elif kind == 'context':
+        return _context_step
+    elif kind == 'injected':
+        return _injected_step(*info)
+    elif kind == 'service':
+        return _service_step(*info)
+    elif kind == 'default':
+        return _constant_step(*info)
+    else:  # missing
+        return info[0]
+
+
+def _is_service_type(field_type):
+    try:
+        _iface_for_type(field_type)
+    except TypeError:
+        # Seems that wired, when looking up str, gives:
+        #   TypeError: can't set attributes of bui...sion type 'str'
+        # We know up front the lookup will fail so go straight to
+        # looking for a dataclass field default value.
+        return False
+    except Exception:
+        # Let the container raise any other errors at call time
+        pass
+    return True
+
+
+def _container_step(container, context):
+    return container
+
+
+def _context_step(container, context):
+    return context
+
+
+def _constant_step(value):
+    return lambda container, context: value
+
+
+def _injected_step(injected_type, injected_name, injected_attr):
+    # Another special case: if asked to inject Context or
+    # ServiceContainer, consider it like a sentinel and return it.
+    if injected_type is Context:
+        get_target = _context_step
+    elif injected_type is ServiceContainer:
+        get_target = _container_step
+    else:
+
+        def get_target(container, context):
+            # Ask the registry for one of these
+            return container.get(injected_type, name=injected_name)
+
+    if not injected_attr:
+        return get_target
+
+    # If attr is used, get specified attribute off that instance
+    def step(container, context):
+        return getattr(get_target(container, context), injected_attr)
+
+    return step
+
+
+def _missing_step(target, field_name, full_field):
+    def step(container, context):
+        if full_field.init is False:
+            # Expect a __post_init__ that assigns this value
+            if not hasattr(target, '__post_init__'):
+                m = 'has init=False but no __post_init__'
+                msg = f'Field "{field_name}" {m}'
+                raise LookupError(msg)
+            return _skip
+        msg = f'No default value on field {field_name}'
+        raise LookupError(msg)
+
+    return step
+
+
+def _service_error(target, field_name, full_field):
+    field_default = getattr(full_field, 'default', None)
+    missing_step = _missing_step(target, field_name, full_field)
+    has_post_init = hasattr(target, '__post_init__')
+
+    def on_error(container, context, exc):
+        if isinstance(exc, TypeError):
+            if field_default is not MISSING:
+                return field_default
+            return missing_step(container, context)
+
+        # Give up and work around ``wired`` unhelpful exception
+        # by adding some context information.
+
+        # Note that a dataclass with ``__post_init__`` might still
+        # do some construction. Only do this next part if there's
+        # no __post_init__
+        if not has_post_init:
+            m = 'Injector failed for'
+            msg = f'{m} {field_name} on {target.__name__}'
+            raise LookupError(msg)
+        return _skip
+
+    # Either error may skip the field if there is a __post_init__
+    on_error.may_skip = has_post_init
+    return on_error
+
+
+def _service_step(target, field_name, field_type, on_error):
+    def step(container, context):
+        try:
+            return container.get(field_type)
+        except (TypeError, LookupError) as exc:
+            return on_error(container, context, exc)
+
+    return step
+
+
+def _async_injected_step(injected_type, injected_name, injected_attr):
+    async def step(container, context):
+        inst = await container.aget(injected_type, name=injected_name)
+        if injected_attr:
+            return getattr(inst, injected_attr)
+        return inst
+
+    return step
+
+
+def _async_service_step(target, field_name, field_type, on_error):
+    async def step(container, context):
+        try:
+            return await container.aget(field_type)
+        except (TypeError, LookupError) as exc:
+            return on_error(container, context, exc)
+
+    return step
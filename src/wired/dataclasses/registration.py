@@ -1,10 +1,17 @@
 from wired import ServiceRegistry
 
-from .injector import Injector
+from .injector import AsyncInjector, Injector
 
 
 def register_dataclass(
-    registry: ServiceRegistry, target, for_=None, context=None, name=''
+    registry: ServiceRegistry,
+    target,
+    for_=None,
+    context=None,
+    name='',
+    lifetime='container',
+    codegen=False,
+    is_async=False,
 ):
     """
     Register a factory for a dataclass that can sniff dependencies.
@@ -37,6 +44,21 @@ def register_dataclass(
         The ``name`` argument in
         :meth:`wired.ServiceRegistry.register_factory`.
 
+    :param str lifetime:
+        The ``lifetime`` argument in
+        :meth:`wired.ServiceRegistry.register_factory`.
+
+    :param bool codegen:
+        Generate a factory function specialized for ``target``, similar to
+        how :mod:`dataclasses` generates ``__init__``, instead of interpreting
+        the fields on every call. This is faster for services which are
+        created very frequently. Defaults to ``False``.
+
+    :param bool is_async:
+        Register an async factory, created by
+        :meth:`wired.ServiceContainer.aget`, which awaits the services for
+        the fields of ``target`` concurrently. Defaults to ``False``.
+
     .. seealso::
 
         - :func:`wired.dataclasses.factory`
@@ -49,5 +71,12 @@ def register_dataclass(
     if for_ is None:
         for_ = target
 
-    injector = Injector(target)
-    registry.register_factory(injector, for_, context=context, name=name)
+    if is_async:
+        if codegen:
+            raise ValueError('codegen is not supported for async dataclasses')
+        injector = AsyncInjector(target)
+    else:
+        injector = Injector(target, codegen=codegen)
+    registry.register_factory(
+        injector, for_, context=context, name=name, lifetime=lifetime
+    )
@@ -19,10 +19,13 @@ class service_factory:
 
     """
 
-    def __init__(self, for_=None, context=None, name: str = ''):
+    def __init__(
+        self, for_=None, context=None, name: str = '', lifetime: str = 'container'
+    ):
         self.for_ = for_
         self.context = context
         self.name = name
+        self.lifetime = lifetime
 
     def __call__(self, wrapped):
         def callback(scanner: venusian.Scanner, name: str, cls):
@@ -31,7 +34,13 @@ class service_factory:
             # class as the instance
             for_ = self.for_ if self.for_ else cls
 
-            registry.register_factory(cls, for_, context=self.context, name=self.name)
+            registry.register_factory(
+                cls,
+                for_,
+                context=self.context,
+                name=self.name,
+                lifetime=self.lifetime,
+            )
 
         venusian.attach(wrapped, callback, category='wired')
         return wrapped
@@ -1,10 +1,14 @@
+import asyncio
 from dataclasses import dataclass, field
+import gc
 import pytest
+import sys
 from typing import Optional
+import warnings
 
 from wired import ServiceContainer, ServiceRegistry
 from wired.dataclasses import Context, injected
-from wired.dataclasses.injector import Injector
+from wired.dataclasses.injector import AsyncInjector, Injector
 
 
 class Source:
@@ -452,3 +456,242 @@ def test_injected_field_missing_attr(monkeypatch, container):
     with pytest.raises(AttributeError) as exc:
         inj(container)
     assert 'XXX' in str(exc.value)
+
+
+def test_missing_service_with_post_init(container):
+    # A missing service is left for __post_init__ to assign
+
+    @dataclass
+    class Dummy:
+        url: Url = field(init=False)
+
+        def __post_init__(self):
+            self.url = Url()
+
+    inj = Injector(Dummy)
+    result: Dummy = inj(container)
+    assert isinstance(result.url, Url)
+
+
+def test_plan_compiled_once(monkeypatch, container):
+    monkeypatch.setattr(container, 'get', DummySingleton.d_get)
+    inj = Injector(DummySingleton)
+    assert inj.plan is None
+    inj(container)
+    plan = inj.plan
+    assert [name for name, step in plan] == ['singleton']
+    result: DummySingleton = inj(container)
+    assert inj.plan is plan
+    assert 'singleton' == result.singleton.name
+
+
+class Attr:
+    value = 'value'
+    weird = 'weird'
+
+
+@dataclass
+class DummyGenerated:
+    container: ServiceContainer
+    context: Context
+    source: Source
+    attr_value: str = injected(Attr, attr='value')
+    attr_weird: str = injected(Attr, name='weird', attr='not-an-identifier')
+    injected_container: object = injected(ServiceContainer)
+    injected_context: DummyCustomer = injected(Context, attr='name')
+    greeting: str = 'hello'
+
+
+@pytest.fixture
+def generated_container(dummy_customer):
+    registry = ServiceRegistry()
+    registry.register_factory(lambda c: Source(), Source)
+    attr = Attr()
+    setattr(attr, 'not-an-identifier', 'weird')
+    registry.register_singleton(attr, Attr)
+    registry.register_singleton(attr, Attr, name='weird')
+    return registry.create_container(context=dummy_customer)
+
+
+@pytest.mark.parametrize('codegen', [False, True])
+def test_codegen_matches_interpreter(generated_container, codegen):
+    inj = Injector(DummyGenerated, codegen=codegen)
+    result: DummyGenerated = inj(generated_container)
+    assert result.container is generated_container
+    assert result.context is generated_container.context
+    assert result.source.name == 'source'
+    assert result.attr_value == 'value'
+    assert result.attr_weird == 'weird'
+    assert result.injected_container is generated_container
+    assert result.injected_context == 'dummy_customer'
+    assert result.greeting == 'hello'
+    assert inj(generated_container) == result
+    assert (inj.factory is not None) is codegen
+
+
+def test_codegen_optional_fields(container):
+    @dataclass
+    class Dummy:
+        url: Url = field(init=False)
+        name: str = field(init=False)
+        container: ServiceContainer = None
+
+        def __post_init__(self):
+            self.url = Url()
+            self.name = 'initialized'
+
+    inj = Injector(Dummy, codegen=True)
+    result: Dummy = inj(container)
+    assert isinstance(result.url, Url)
+    assert result.name == 'initialized'
+    assert result.container is container
+
+
+@pytest.mark.parametrize('codegen', [False, True])
+def test_no_default_for_type_error(monkeypatch, container, codegen):
+    @dataclass
+    class Dummy:
+        source: Source
+
+    monkeypatch.setattr(container, 'get', DummyFailPVND.d_get)
+    with pytest.raises(LookupError) as exc:
+        Injector(Dummy, codegen=codegen)(container)
+    assert 'No default value on field source' == str(exc.value)
+
+
+def test_codegen_default_for_type_error(monkeypatch, container):
+    @dataclass
+    class Dummy:
+        source: Source = None
+
+    monkeypatch.setattr(container, 'get', DummyFailPVND.d_get)
+    result: Dummy = Injector(Dummy, codegen=True)(container)
+    assert result.source is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason='requires kw_only')
+@pytest.mark.parametrize('codegen', [False, True])
+def test_kw_only_fields(generated_container, codegen):
+    @dataclass(kw_only=True)
+    class Dummy:
+        source: Source
+
+    @dataclass
+    class Mixed:
+        source: Source
+        name: str = field(default='mixed', kw_only=True)
+
+    result: Dummy = Injector(Dummy, codegen=codegen)(generated_container)
+    assert result.source.name == 'source'
+    result: Mixed = Injector(Mixed, codegen=codegen)(generated_container)
+    assert result.source.name == 'source'
+    assert result.name == 'mixed'
+
+
+def test_codegen_missing_value(container):
+    inj = Injector(DummyFailPVND, codegen=True)
+    with pytest.raises(LookupError) as exc:
+        inj(container)
+    assert 'No default value on field target' == str(exc.value)
+
+
+def test_codegen_missing_service(container):
+    inj = Injector(DummyNoRegistrations, codegen=True)
+    with pytest.raises(LookupError) as exc:
+        inj(container)
+    msg = 'Injector failed for target on DummyNoRegistrations'
+    assert msg == str(exc.value)
+
+
+def test_async_injector_matches_interpreter(generated_container):
+    inj = AsyncInjector(DummyGenerated)
+    result: DummyGenerated = asyncio.run(inj(generated_container))
+    assert result == Injector(DummyGenerated)(generated_container)
+    assert [len(entry) for entry in inj.plan] == [3] * 8
+
+
+class Database:
+    pass
+
+
+@dataclass
+class DummyAsync:
+    source: Source
+    db: Database
+    attr_value: str = injected(Attr, attr='value')
+    attr: Attr = injected(Attr)
+    greeting: str = 'hello'
+
+
+def test_async_injector_concurrent(dummy_customer):
+    running = []
+    started = []
+
+    def make_factory(result):
+        async def factory(container):
+            running.append(result)
+            started.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(result)
+            return result
+
+        return factory
+
+    registry = ServiceRegistry()
+    registry.register_factory(make_factory(Source()), Source)
+    registry.register_factory(make_factory(Database()), Database)
+    registry.register_factory(make_factory(Attr()), Attr)
+    container = registry.create_container()
+
+    result: DummyAsync = asyncio.run(AsyncInjector(DummyAsync)(container))
+    assert result.source is container.get(Source)
+    assert result.db is container.get(Database)
+    assert result.attr is container.get(Attr)
+    assert result.attr_value == 'value'
+    assert result.greeting == 'hello'
+    assert started == [1, 2, 3]
+
+
+def test_async_injector_missing_service(container):
+    async def factory(container):
+        raise LookupError
+
+    container.register_factory(factory, Source)
+    with pytest.raises(LookupError) as exc:
+        asyncio.run(AsyncInjector(DummyNoRegistrations)(container))
+    msg = 'Injector failed for target on DummyNoRegistrations'
+    assert msg == str(exc.value)
+
+
+def test_async_injector_missing_service_after_async(container):
+    @dataclass
+    class Dummy:
+        source: Source
+        url: Url
+
+    async def factory(container):  # pragma: no cover
+        return Source()
+
+    container.register_factory(factory, Source)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with pytest.raises(LookupError):
+            asyncio.run(AsyncInjector(Dummy)(container))
+        gc.collect()
+    assert not [w for w in caught if issubclass(w.category, RuntimeWarning)]
+
+
+def test_async_injector_optional_service(container):
+    @dataclass
+    class Dummy:
+        url: Url = field(init=False)
+
+        def __post_init__(self):
+            self.url = Url()
+
+    async def factory(container):
+        raise LookupError
+
+    container.register_factory(factory, Url)
+    result: Dummy = asyncio.run(AsyncInjector(Dummy)(container))
+    assert isinstance(result.url, Url)
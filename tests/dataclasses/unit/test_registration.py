@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 import pytest
 
@@ -34,3 +35,29 @@ def test_basic(registry: ServiceRegistry, container: ServiceContainer):
     customer: DummyCustomer = container.get(DummyCustomer)
     assert 'dummy_greeter' == greeter.name
     assert 'dummy_customer' == customer.name
+
+
+def test_singleton_lifetime(registry: ServiceRegistry):
+    register_dataclass(registry, DummyGreeter, lifetime='singleton')
+    greeter = registry.create_container().get(DummyGreeter)
+    assert registry.create_container().get(DummyGreeter) is greeter
+
+
+def test_transient_lifetime(registry: ServiceRegistry, container: ServiceContainer):
+    register_dataclass(registry, DummyGreeter, lifetime='transient')
+    assert container.get(DummyGreeter) is not container.get(DummyGreeter)
+
+
+def test_codegen(registry: ServiceRegistry, container: ServiceContainer):
+    register_dataclass(registry, DummyGreeter, codegen=True)
+    greeter: DummyGreeter = container.get(DummyGreeter)
+    assert 'dummy_greeter' == greeter.name
+    assert registry.find_factory(DummyGreeter).factory is not None
+
+
+def test_is_async(registry: ServiceRegistry, container: ServiceContainer):
+    register_dataclass(registry, DummyGreeter, is_async=True)
+    greeter: DummyGreeter = asyncio.run(container.aget(DummyGreeter))
+    assert container.get(DummyGreeter) is greeter
+    with pytest.raises(ValueError):
+        register_dataclass(registry, DummyCustomer, is_async=True, codegen=True)
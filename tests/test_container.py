@@ -1,5 +1,12 @@
+import asyncio
+from collections import OrderedDict, UserDict
+import gc
 import pytest
-from zope.interface import Interface, implementer
+import random
+import threading
+import warnings
+from zope.interface import Interface, implementedBy, implementer, providedBy
+from zope.interface.adapter import AdapterRegistry
 
 
 class IFooService(Interface):
@@ -61,6 +68,65 @@ class DummyWiredFactory:
         return inst
 
 
+class WaitingLock:
+    """An RLock which counts the threads that tried to acquire it."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.arrived = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            self.arrived += 1
+            self.cond.notify_all()
+        self.lock.acquire()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.lock.release()
+
+    def wait_for_arrivals(self, count):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.arrived >= count, 5)
+
+
+class SingleFlight:
+    """
+    Look up a service from several threads at once.
+
+    The factory is invoked while holding :attr:`lock`, and waits for every
+    other thread to block on the lock before returning the service.
+
+    """
+
+    def __init__(self, threads=4):
+        self.threads = threads
+        self.lock = WaitingLock()
+        self.calls = []
+        self.waited = []
+
+    def factory(self, container):
+        self.calls.append(container)
+        self.waited.append(self.lock.wait_for_arrivals(self.threads))
+        return DummyService()
+
+    def run(self, get):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get()))
+            for _ in range(self.threads)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        assert self.waited == [True]
+        assert len(self.calls) == 1
+        assert len(results) == self.threads
+        assert all(svc is results[0] for svc in results)
+        return results[0]
+
+
 @pytest.fixture
 def registry():
     from wired import ServiceRegistry
@@ -68,6 +134,11 @@ def registry():
     return ServiceRegistry()
 
 
+def _maybe_freeze(registry, frozen):
+    if frozen:
+        registry.freeze()
+
+
 def test_sentinel_repr():
     from wired.container import _marker
 
@@ -86,10 +157,12 @@ def test_sentinel_repr():
         pytest.param((IContextInterface, ContextA()), marks=pytest.mark.xfail),
     ],
 )
-def test_various_params(registry, iface, contexts, name):
+@pytest.mark.parametrize('frozen', [False, True])
+def test_various_params(registry, iface, contexts, name, frozen):
     context_iface, context_obj = contexts
     factory = DummyFactory()
     registry.register_factory(factory, iface, context=context_iface, name=name)
+    _maybe_freeze(registry, frozen)
     c = registry.create_container()
     assert c.get(iface, context=context_obj, name=name) is factory.result
     assert c.get(iface, context=context_obj, name=name) is factory.result
@@ -282,3 +355,1567 @@ def test_cache_context(registry):
     assert container.get(DummyFactory) is factory_a.result
     assert container.get(DummyFactory, context=context_a) is factory_a.result
     assert container.get(DummyFactory, context=context_b) is factory_b.result
+
+
+def test_lookup_plans_are_shared_by_containers(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    c1 = registry.create_container()
+    assert c1.get(IFooService) is factory.result
+    assert len(registry._plans) == 1
+    c2 = registry.create_container()
+    assert c2.get(IFooService) is factory.result
+    assert len(registry._plans) == 1
+    assert len(factory.calls) == 2
+
+
+def test_lookup_plans_invalidated_by_registration(registry):
+    marker = object()
+    c1 = registry.create_container()
+    assert c1.get(IFooService, default=marker) is marker
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    assert c1.get(IFooService) is factory.result
+
+
+def test_lookup_plans_invalidated_selectively(registry):
+    marker = object()
+    factory = DummyFactory()
+    registry.register_factory(factory, IBarService, name='bar')
+    c1 = registry.create_container()
+    assert c1.get(IFooService, default=marker) is marker
+    assert c1.get(IBarService, default=marker) is marker
+    assert c1.get(IBarService, name='foo', default=marker) is marker
+    assert c1.get(IBarService, context=ContextA(), default=marker) is marker
+    assert len(registry._plans) == 4
+
+    # only plans for more general interfaces and contexts are affected
+    registry.register_factory(factory, IBarService, context=ContextA)
+    assert len(registry._plans) == 3
+    assert c1.get(IFooService, context=ContextA()) is factory.result
+    assert c1.get(IFooService, default=marker) is marker
+    registry.register_factory(factory, IBazService)
+    assert len(registry._plans) == 2
+    registry.register_factory(factory, IBarService)
+    assert len(registry._plans) == 1
+    assert c1.get(IFooService) is factory.result
+    assert c1.get(IBarService, name='foo', default=marker) is marker
+
+
+def test_lookup_plans_invalidated_by_new_interface(registry):
+    class IBase(Interface):
+        pass
+
+    class IA(IBase):
+        pass
+
+    class IB(IBase):
+        pass
+
+    class IC(IA):
+        pass
+
+    a_factory = DummyFactory('a')
+    b_factory = DummyFactory('b')
+    registry.register_factory(a_factory, IA)
+    registry.register_factory(b_factory, IB)
+    assert registry.create_container().get(IBase) == 'b'
+
+    # the first factory for IC puts IA ahead of IB as candidates for IBase,
+    # even though it is registered for a different context
+    registry.register_factory(DummyFactory('c'), IC, context=ContextA)
+    assert registry.find_factory(IBase) is a_factory
+    assert registry.create_container().get(IBase) == 'a'
+
+
+def test_failed_lookups_are_memoized(registry):
+    marker = object()
+    c = registry.create_container()
+    assert c.get(IFooService, default=marker) is marker
+    assert c._cache.get(None).misses == {(IFooService, providedBy(None), '')}
+    c.set(DummyService(), IBarService)
+    assert c._cache.get(None).misses == set()
+    assert isinstance(c.get(IFooService), DummyService)
+
+
+def test_lookup_plans_with_container_overrides(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(factory, IBarService)
+    c1 = registry.create_container()
+    assert c1.get(IFooService) is factory.result
+
+    override = DummyService()
+    c2 = registry.create_container()
+    c2.register_singleton(override, IFooService)
+    assert c2.get(IFooService) is override
+    assert c2.get(IBarService) is factory.result
+    assert c2.get(IBarService, context=ContextA()) is factory.result
+    assert registry.create_container().get(IFooService) is factory.result
+
+    baz_factory = DummyFactory()
+    registry.register_factory(baz_factory, IBazService)
+    assert c2.get(IBazService) is baz_factory.result
+
+
+def test_freeze_prevents_registration(registry):
+    registry.freeze()
+    registry.freeze()
+    with pytest.raises(RuntimeError):
+        registry.register_factory(DummyFactory(), IFooService)
+    with pytest.raises(RuntimeError):
+        registry.register_singleton(DummyService(), IFooService)
+
+
+def test_frozen_registry_matches_adapter_lookup(registry):
+    foo_factory = DummyFactory()
+    bar_factory = DummyFactory()
+    ctx_factory = DummyFactory()
+    iface_factory = DummyFactory()
+    registry.register_factory(foo_factory, IFooService)
+    registry.register_factory(bar_factory, IBarService)
+    registry.register_factory(ctx_factory, IFooService, context=ContextA)
+    registry.register_factory(
+        iface_factory, IFooService, context=IContextInterface, name='foo'
+    )
+    registry._factories.register((Interface,), IFooService, '', object())
+    cases = [
+        (IFooService, None, ''),
+        (IBarService, None, ''),
+        (IBazService, None, ''),
+        (IFooService, ContextA(), ''),
+        (IFooService, ContextB(), ''),
+        (IFooService, ContextWithInterface(), 'foo'),
+        (IFooService, ContextA(), 'foo'),
+    ]
+    expected = [
+        registry.create_container().get(iface, context=ctx, name=name, default=None)
+        for iface, ctx, name in cases
+    ]
+    registry.freeze()
+    result = [
+        registry.create_container().get(iface, context=ctx, name=name, default=None)
+        for iface, ctx, name in cases
+    ]
+    assert result == expected
+    assert expected[1] is bar_factory.result
+    assert expected[3] is ctx_factory.result
+    assert expected[5] is iface_factory.result
+    assert registry.find_factory(IFooService, context=ContextA) is ctx_factory
+
+
+def test_frozen_registry_respects_base_registries():
+    from wired import ServiceRegistry
+
+    base = ServiceRegistry()
+    base_factory = DummyFactory()
+    base.register_factory(base_factory, IFooService, context=ContextA)
+    base.register_factory(base_factory, IBarService)
+    registry = ServiceRegistry(AdapterRegistry(bases=(base._factories,)))
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.freeze()
+    c = registry.create_container()
+    assert c.get(IFooService, context=ContextA()) is factory.result
+    assert c.get(IBarService) is base_factory.result
+
+
+def test_plans_follow_changes_to_base_registries():
+    from wired import ServiceRegistry
+
+    base = ServiceRegistry()
+    registry = ServiceRegistry(AdapterRegistry(bases=(base._factories,)))
+    c = registry.create_container()
+    assert c.get(IFooService, default=None) is None
+    factory = DummyFactory()
+    base.register_factory(factory, IFooService)
+    assert registry.create_container().get(IFooService) is factory.result
+    assert c.get(IFooService) is factory.result
+
+
+def test_plans_follow_changes_to_factory_registry():
+    from wired import ServiceRegistry
+    from wired.container import IServiceFactory, ServiceFactoryInfo
+
+    factories = AdapterRegistry()
+    registry = ServiceRegistry(factories)
+    assert registry.create_container().get(IFooService, default=None) is None
+    factory = DummyFactory()
+    info = ServiceFactoryInfo(factory, IFooService, Interface, False)
+    factories.register((IServiceFactory, Interface), IFooService, '', info)
+    assert registry.create_container().get(IFooService) is factory.result
+
+
+def test_frozen_registry_container_overrides(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.freeze()
+    c = registry.create_container()
+    override = DummyService()
+    c.register_singleton(override, IFooService, context=ContextA)
+    assert c.get(IFooService) is factory.result
+    assert c.get(IFooService, context=ContextA()) is override
+
+
+@pytest.mark.parametrize(
+    'ifaces',
+    [
+        (IFooService, IBarService),
+        (IBarService, IFooService),
+        (IBarService, IBazService),
+        (IBazService, IBarService),
+        (IBarService, IBazService, IFooService),
+    ],
+)
+def test_context_cache_matches_adapter_lookup(ifaces):
+    from wired.container import ContextCache, _marker
+
+    ctx_iface = providedBy(ContextWithInterface())
+    expected = AdapterRegistry()
+    cache = ContextCache()
+    for iface in ifaces:
+        expected.register((ctx_iface,), iface, '', iface)
+        cache.register(iface, ctx_iface, '', iface)
+    cache.register(IBarService, Interface, 'foo', 'other')
+    for iface in (IFooService, IBarService, IBazService, Interface):
+        result = cache.lookup(iface, ctx_iface, '')
+        assert result == expected.lookup((ctx_iface,), iface, default=_marker)
+
+
+def test_context_cache_orders_extendors_across_names(registry):
+    class IA(Interface):
+        pass
+
+    class IB(Interface):
+        pass
+
+    c = registry.create_container()
+    c.set('b-named', IB, name='x')
+    c.set('a', IA)
+    c.set('b', IB)
+    assert c.get(Interface) == 'a'
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_context_cache_matches_adapter_lookup_fuzz(seed):
+    from wired.container import ContextCache, _marker
+
+    rng = random.Random(seed)
+    ifaces = [IFooService, IBarService, IBazService, Interface]
+    ctx_iface = providedBy(ContextWithInterface())
+    specs = [ctx_iface, IContextInterface, Interface]
+    names = ['', 'x']
+    expected = AdapterRegistry()
+    cache = ContextCache()
+    for idx in range(rng.randint(1, 8)):
+        iface, spec, name = rng.choice(ifaces), rng.choice(specs), rng.choice(names)
+        expected.register((spec,), iface, name, idx)
+        cache.register(iface, spec, name, idx)
+    for iface in ifaces:
+        for name in names:
+            result = cache.lookup(iface, ctx_iface, name)
+            assert result == expected.lookup((ctx_iface,), iface, name, _marker)
+
+
+def test_set_satisfies_less_specific_lookups(registry):
+    svc = DummyService()
+    c = registry.create_container()
+    c.set(svc, IBarService)
+    assert c.get(IFooService) is svc
+    assert c.get(IFooService) is svc
+    with pytest.raises(LookupError):
+        c.get(IBazService)
+
+
+def test_value_contexts_are_cached_by_value(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService, context=str)
+    c = registry.create_container()
+    ctx = ''.join(['con', 'text'])
+    assert c.get(IFooService, context=ctx) is factory.result
+    assert c.get(IFooService, context='context') is factory.result
+    assert len(factory.calls) == 1
+    assert c.context_cache_info() == (1, 1, 0, None, 1)
+
+
+def test_value_contexts_are_bounded(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService, context=int)
+    c = registry.create_container(context_cache_size=2)
+    for ctx in (1001, 1002, 1001, 1003, 1002):
+        c.get(IFooService, context=ctx)
+    assert len(factory.calls) == 4
+    info = c.context_cache_info()
+    assert info.hits == 1
+    assert info.misses == 4
+    assert info.evictions == 2
+    assert info.maxsize == 2
+    assert info.currsize == 2
+
+
+def test_value_context_evicted_by_another_thread(registry):
+    class Values(OrderedDict):
+        def move_to_end(self, key):
+            # another thread evicts the context after it was found
+            self.pop(key)
+            super().move_to_end(key)
+
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService, context=int)
+    c = registry.create_container(thread_safe=True, context_cache_size=1)
+    assert c.get(IFooService, context=1001) is factory.result
+    cache = c._cache
+    cache._values = Values(cache._values)
+    assert c.get(IFooService, context=1001) is factory.result
+    assert len(factory.calls) == 2
+    assert c.context_cache_info().currsize == 1
+
+
+def test_unhashable_value_contexts_are_kept_alive(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService, context=list)
+    c = registry.create_container(context_cache_size=1)
+    ctx = []
+    assert c.get(IFooService, context=ctx) is factory.result
+    assert c.get(IFooService, context=ctx) is factory.result
+    assert c._cache.get(ctx).context is ctx
+    c.get(IFooService, context=[])
+    assert len(factory.calls) == 2
+    assert c.context_cache_info().evictions == 1
+
+
+def test_lazy_singleton_lifetime(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService, lifetime='singleton')
+    assert factory.calls == []
+    c1 = registry.create_container()
+    c2 = registry.create_container()
+    assert c1.get(IFooService) is factory.result
+    assert c2.get(IFooService) is factory.result
+    assert factory.calls == [c1]
+
+
+def test_lazy_singleton_retries_failed_factory(registry):
+    calls = []
+
+    def factory(container):
+        calls.append(container)
+        if len(calls) == 1:
+            raise RuntimeError
+        return DummyService()
+
+    registry.register_factory(factory, IFooService, lifetime='singleton')
+    with pytest.raises(RuntimeError):
+        registry.create_container().get(IFooService)
+    svc = registry.create_container().get(IFooService)
+    assert registry.create_container().get(IFooService) is svc
+    assert len(calls) == 2
+
+
+def test_lazy_singleton_single_flight(registry):
+    flight = SingleFlight()
+    registry.register_factory(flight.factory, IFooService, lifetime='singleton')
+    registry.find_factory(IFooService).lock = flight.lock
+    svc = flight.run(lambda: registry.create_container().get(IFooService))
+    assert registry.create_container().get(IFooService) is svc
+
+
+def test_thread_safe_container_creates_service_once(registry):
+    flight = SingleFlight()
+    registry.register_factory(flight.factory, IFooService, context=ContextA)
+    container = registry.create_container(thread_safe=True)
+    context = ContextA()
+    key = (IFooService, implementedBy(ContextA), '')
+    container._cache.get(context).locks = {key: flight.lock}
+    svc = flight.run(lambda: container.get(IFooService, context=context))
+    assert container.get(IFooService, context=context) is svc
+
+
+def test_thread_safe_container_per_context(registry):
+    registry.register_factory(
+        lambda c: (c.context, DummyService()), IFooService, context=Interface
+    )
+    container = registry.create_container(thread_safe=True)
+    svc = container.get(IFooService)
+    assert svc[0] is None
+    assert container.get(IFooService) is svc
+    by_value = container.get(IFooService, context='a')
+    assert by_value[0] == 'a'
+    assert container.get(IFooService, context='a') is by_value
+    context = ContextA()
+    by_ref = container.get(IFooService, context=context)
+    assert by_ref[0] is context
+    assert container.get(IFooService, context=context) is by_ref
+
+
+def test_thread_safe_container_transient(registry):
+    registry.register_factory(
+        lambda c: DummyService(), IFooService, lifetime='transient'
+    )
+    container = registry.create_container(thread_safe=True)
+    assert container.get(IFooService) is not container.get(IFooService)
+
+
+def test_thread_safe_container_nested_lookup(registry):
+    registry.register_factory(lambda c: DummyService(), name='dep')
+    registry.register_factory(lambda c: (c.get(name='dep'),), IFooService)
+    container = registry.create_container(thread_safe=True)
+    svc = container.get(IFooService)
+    assert svc[0] is container.get(name='dep')
+
+
+def test_dead_context_is_removed_from_cache(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService, context=ContextA)
+    container = registry.create_container()
+    context = ContextA()
+    ctx_id = id(context)
+    container.get(IFooService, context=context)
+    assert ctx_id in container._cache._contexts
+    del context
+    gc.collect()
+    assert ctx_id not in container._cache._contexts
+
+
+def test_context_outliving_cache(registry):
+    registry.register_factory(DummyFactory(), IFooService, context=ContextA)
+    container = registry.create_container()
+    context = ContextA()
+    container.get(IFooService, context=context)
+    del container
+    gc.collect()
+    del context
+    gc.collect()
+
+
+def test_concurrent_context_finalization(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService, context=ContextA)
+    registry.freeze()
+    container = registry.create_container(thread_safe=True)
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def worker():
+        barrier.wait(5)
+        try:
+            for _ in range(200):
+                context = ContextA()
+                svc = container.get(IFooService, context=context)
+                assert container.get(IFooService, context=context) is svc
+                del context
+        except Exception as ex:  # pragma: no cover
+            errors.append(ex)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert errors == []
+    assert container._cache._contexts == {}
+
+
+def test_frozen_registry_shared_between_threads(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService)
+    registry.register_factory(
+        lambda c: (c.context, DummyService()), IFooService, context=ContextA
+    )
+    registry.freeze()
+    barrier = threading.Barrier(4)
+    results = []
+
+    def worker():
+        barrier.wait(5)
+        container = registry.create_container()
+        context = ContextA()
+        for _ in range(100):
+            svc = container.get(IFooService)
+            ctx_svc = container.get(IFooService, context=context)
+        results.append((svc, ctx_svc, context))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(results) == 4
+    assert len({id(svc) for svc, _, _ in results}) == 4
+    for svc, ctx_svc, context in results:
+        assert isinstance(svc, DummyService)
+        assert ctx_svc[0] is context
+
+
+def test_invalid_lifetime(registry):
+    with pytest.raises(ValueError):
+        registry.register_factory(DummyFactory(), IFooService, lifetime='forever')
+
+
+def test_transient_lifetime(registry):
+    calls = []
+
+    def factory(container):
+        calls.append(container)
+        return DummyService()
+
+    registry.register_factory(factory, IFooService, lifetime='transient')
+    c = registry.create_container()
+    svc1 = c.get(IFooService)
+    svc2 = c.get(IFooService, context=ContextA())
+    assert svc1 is not svc2
+    assert len(calls) == 2
+    assert c._cache.get(None).instances == {}
+
+
+class RecordingHook:
+    def __init__(self):
+        self.events = []
+
+    def cache_hit(self, container, iface_or_type, name, service):
+        self.events.append(('hit', iface_or_type, name, service))
+
+    def cache_miss(self, container, iface_or_type, name):
+        self.events.append(('miss', iface_or_type, name))
+
+    def factory_start(self, container, iface_or_type, name, factory):
+        self.events.append(('start', iface_or_type, name, factory))
+
+    def factory_end(self, container, iface_or_type, name, service, duration):
+        assert duration >= 0
+        self.events.append(('end', iface_or_type, name, service))
+
+    def lookup_failed(self, container, iface_or_type, name):
+        self.events.append(('failed', iface_or_type, name))
+
+
+def test_containers_without_hooks_are_not_instrumented(registry):
+    from wired.container import InstrumentedServiceContainer
+
+    c = registry.create_container()
+    assert not isinstance(c, InstrumentedServiceContainer)
+
+
+def test_hooks_observe_lookups(registry):
+    hook = RecordingHook()
+    registry.add_hook(hook)
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+    svc = c.get(IFooService)
+    assert c.get(IFooService) is svc
+    with pytest.raises(LookupError):
+        c.get(IBarService)
+    assert c.get(IBarService, name='foo', default=None) is None
+    assert hook.events == [
+        ('miss', IFooService, ''),
+        ('start', IFooService, '', factory),
+        ('end', IFooService, '', svc),
+        ('hit', IFooService, '', svc),
+        ('failed', IBarService, ''),
+        ('failed', IBarService, 'foo'),
+    ]
+
+
+def test_hooks_report_each_lookup_once(registry):
+    hook = RecordingHook()
+    registry.add_hook(hook)
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+    context = ContextA()
+    svc = c.get(IFooService, context=context)
+    assert c.get(IFooService, context=context) is svc
+    assert c.bind(context=context).get(IFooService) is svc
+    assert hook.events == [
+        ('miss', IFooService, ''),
+        ('start', IFooService, '', factory),
+        ('end', IFooService, '', svc),
+        ('hit', IFooService, '', svc),
+        ('hit', IFooService, '', svc),
+    ]
+
+
+def test_hooks_observe_failed_factories(registry):
+    from wired import ServiceHook
+
+    hook = RecordingHook()
+    registry.add_hook(ServiceHook())
+    registry.add_hook(hook)
+
+    def factory(container):
+        raise ValueError
+
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+    with pytest.raises(ValueError):
+        c.get(IFooService)
+    assert hook.events == [
+        ('miss', IFooService, ''),
+        ('start', IFooService, '', factory),
+        ('end', IFooService, '', None),
+    ]
+
+
+def test_context_switches_without_binding(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(factory, DummyService, context=ContextA)
+    c = registry.create_container()
+    context = ContextA()
+    foo = c.get(IFooService, context=context)
+    bar = c.get(DummyService, context=context)
+    assert [call.context for call in factory.calls] == [None, context]
+
+    def bind(*, context):  # pragma: no cover
+        raise AssertionError('unexpected bind')
+
+    c.bind = bind
+    assert c.get(IFooService, context=context) is foo
+    assert c.get(DummyService, context=context) is bar
+
+
+def test_batch_matches_sequential_registration():
+    from wired import ServiceRegistry
+
+    class IQuxService(IBarService, IBazService):
+        pass
+
+    class ISpamService(IBarService):
+        pass
+
+    registrations = [
+        (IBarService, None, ''),
+        (IFooService, ContextA, ''),
+        (Interface, None, ''),
+        (IQuxService, None, ''),
+        (IBazService, None, 'baz'),
+        (IFooService, None, ''),
+        (DummyService, ContextA, ''),
+        (IBarService, None, ''),
+        (ISpamService, None, ''),
+    ]
+    sequential = ServiceRegistry()
+    batched = ServiceRegistry()
+    for idx, (iface, context, name) in enumerate(registrations):
+        sequential.register_factory(
+            DummyFactory(idx), iface, context=context, name=name
+        )
+        if idx < 2:
+            batched.register_factory(
+                DummyFactory(idx), iface, context=context, name=name
+            )
+    with batched.batch():
+        for idx, (iface, context, name) in enumerate(registrations[2:], 2):
+            batched.register_factory(
+                DummyFactory(idx), iface, context=context, name=name
+            )
+
+    assert sequential._factories._provided == batched._factories._provided
+    assert (
+        sequential._factories._v_lookup._extendors
+        == batched._factories._v_lookup._extendors
+    )
+    ifaces = (Interface, IFooService, IBarService, IBazService, IQuxService)
+    for iface in ifaces:
+        for context in (None, ContextA):
+            for name in ('', 'baz'):
+                expected = sequential.find_factory(iface, context=context, name=name)
+                actual = batched.find_factory(iface, context=context, name=name)
+                assert (expected and expected.result) == (actual and actual.result)
+
+
+def test_batch_commits_on_exit(registry):
+    factory = DummyFactory()
+    c = registry.create_container()
+    assert c.get(IFooService, default=None) is None
+    with registry.batch():
+        with registry.batch():
+            registry.register_factory(factory, IFooService)
+        assert registry.find_factory(IFooService) is None
+    assert registry.find_factory(IFooService) is factory
+    assert c.get(IFooService) is factory.result
+
+
+def test_batch_discarded_on_error(registry):
+    with pytest.raises(ValueError):
+        with registry.batch():
+            registry.register_factory(DummyFactory(), IFooService)
+            raise ValueError
+    assert registry.find_factory(IFooService) is None
+    with registry.batch():
+        registry.register_factory(DummyFactory(), IBarService)
+    assert registry.find_factory(IFooService) is not None
+
+
+def test_batch_failed_commit_is_consistent(registry):
+    factory = DummyFactory()
+    with pytest.raises(ValueError):
+        with registry.batch():
+            registry.register_factory(factory, IFooService)
+            registry.register_factory(factory, IBarService, name=None)
+    assert registry.find_factory(IFooService) is factory
+    assert registry.find_factory(IBarService, name='') is None
+    assert IBarService not in registry._factories._provided
+    assert registry._factories._v_lookup._extendors[IFooService] == [IFooService]
+
+
+def test_batch_on_frozen_registry(registry):
+    registry.freeze()
+    with pytest.raises(RuntimeError):
+        with registry.batch():
+            pass  # pragma: no cover
+
+
+def test_freeze_within_batch(registry):
+    factory = DummyFactory()
+    with registry.batch():
+        registry.register_factory(factory, IFooService)
+        with pytest.raises(RuntimeError):
+            registry.freeze()
+    assert registry.find_factory(IFooService) is factory
+    registry.freeze()
+    assert registry.find_factory(IFooService) is factory
+
+
+def test_empty_batch(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+    assert c.get(IFooService) is factory.result
+    with registry.batch():
+        pass
+    assert registry.find_factory(IFooService) is factory
+
+
+def test_batch_with_custom_provided_mapping():
+    from wired import ServiceRegistry
+
+    class Registry(AdapterRegistry):
+        # like a persistent registry using a BTree
+        _providedType = UserDict
+
+    registry = ServiceRegistry(factory_registry=Registry())
+    foo_factory = DummyFactory('foo')
+    bar_factory = DummyFactory('bar')
+    with registry.batch():
+        registry.register_factory(foo_factory, IFooService)
+        registry.register_factory(bar_factory, IBarService)
+    assert registry.find_factory(IFooService) is foo_factory
+    assert registry.find_factory(IBarService) is bar_factory
+    assert registry._factories._v_lookup._extendors[IFooService] == [
+        IFooService,
+        IBarService,
+    ]
+
+
+def test_resolver(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(factory, DummyService, context=ContextA)
+    resolve_foo = registry.resolver(IFooService)
+    resolve_dummy = registry.resolver(DummyService)
+    resolve_missing = registry.resolver(IBarService, name='bar', default=None)
+    c = registry.create_container()
+    context = ContextA()
+    bound = c.bind(context=context)
+
+    svc = resolve_foo(c)
+    assert resolve_foo(c) is svc
+    assert resolve_foo(bound) is svc
+    assert resolve_dummy(bound) is bound.get(DummyService)
+    assert resolve_dummy(bound) is bound.get(DummyService)
+    assert resolve_missing(c) is None
+    with pytest.raises(LookupError):
+        resolve_dummy(c)
+    resolve_in_context = registry.resolver(DummyService, context=context)
+    assert resolve_in_context(c) is resolve_dummy(bound)
+    assert len(factory.calls) == 2
+
+
+def test_resolver_rejects_invalid_types(registry):
+    with pytest.raises(ValueError):
+        registry.resolver('foo')
+
+
+def test_resolver_reports_to_hooks(registry):
+    hook = RecordingHook()
+    registry.add_hook(hook)
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    resolve_foo = registry.resolver(IFooService)
+    c = registry.create_container()
+    svc = resolve_foo(c)
+    assert resolve_foo(c) is svc
+    assert c.resolver(IFooService)() is svc
+    assert hook.events[-2:] == [
+        ('hit', IFooService, '', svc),
+        ('hit', IFooService, '', svc),
+    ]
+
+
+def test_container_resolver(registry):
+    factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(factory, DummyService, context=ContextA)
+    c = registry.create_container()
+    resolve_foo = c.resolver(IFooService)
+    assert resolve_foo() is resolve_foo()
+    assert resolve_foo() is c.get(IFooService)
+
+    context = ContextA()
+    resolve_dummy = c.resolver(DummyService, context=context)
+    assert resolve_dummy() is c.get(DummyService, context=context)
+    assert resolve_dummy() is resolve_dummy()
+    assert c.resolver(IBarService, default=None)() is None
+
+    assert len(factory.calls) == 2
+
+    # value contexts may be evicted so they are not pinned by the resolver
+    registry.register_factory(lambda c: DummyService(), IBazService, context=str)
+    c = registry.create_container(context='foo', context_cache_size=1)
+    resolve_baz = c.resolver(IBazService)
+    svc = resolve_baz()
+    assert resolve_baz() is svc
+    c.get(IBazService, context='bar')
+    assert resolve_baz() is not svc
+
+
+def test_get_many(registry):
+    factory = DummyFactory()
+    named_factory = DummyFactory()
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(named_factory, IFooService, name='foo')
+    c = registry.create_container()
+    foo = c.get(IFooService)
+    assert c.get_many([]) == ()
+    assert c.get_many([IFooService, (IFooService, 'foo'), IFooService]) == (
+        foo,
+        named_factory.result,
+        foo,
+    )
+    assert c.get_many([(IBarService, 'foo'), IFooService], default=None) == (
+        None,
+        foo,
+    )
+    with pytest.raises(LookupError):
+        c.get_many([IFooService, IBarService])
+    assert c.get_many([IFooService], context=ContextA()) == (foo,)
+    assert len(factory.calls) == 1
+    assert len(named_factory.calls) == 1
+
+
+def test_get_many_reports_to_hooks(registry):
+    hook = RecordingHook()
+    registry.add_hook(hook)
+    registry.register_factory(DummyFactory(), IFooService)
+    c = registry.create_container()
+    svc = c.get(IFooService)
+    assert c.get_many([IFooService]) == (svc,)
+    assert hook.events[-1] == ('hit', IFooService, '', svc)
+
+
+def test_aget_async_factory(registry):
+    calls = []
+
+    async def factory(container):
+        calls.append(container)
+        await asyncio.sleep(0)
+        return DummyService()
+
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(DummyFactory(), IBarService)
+    c = registry.create_container()
+    with pytest.raises(RuntimeError, match='aget'):
+        c.get(IFooService)
+
+    async def main():
+        svc = await c.aget(IFooService)
+        assert await c.aget(IFooService) is svc
+        assert await c.aget(IBarService) is c.get(IBarService)
+        assert await c.aget(IBazService, default=None) is None
+        return svc
+
+    svc = asyncio.run(main())
+    assert c.get(IFooService) is svc
+    assert calls == [c]
+
+
+def test_aget_single_flight(registry):
+    calls = []
+
+    async def factory(container):
+        calls.append(container)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise ValueError
+        return DummyService()
+
+    registry.register_factory(factory, IFooService, context=ContextA)
+    c = registry.create_container()
+    context = ContextA()
+
+    async def main():
+        results = await asyncio.gather(
+            *[c.aget(IFooService, context=context) for _ in range(3)],
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        results = await asyncio.gather(
+            *[c.aget(IFooService, context=context) for _ in range(3)]
+        )
+        assert all(result is results[0] for result in results)
+        assert c.get(IFooService, context=context) is results[0]
+
+    asyncio.run(main())
+    assert [call.context for call in calls] == [context, context]
+
+
+def test_aget_survives_cancelled_caller(registry):
+    async def factory(container):
+        await asyncio.sleep(0.01)
+        return DummyService()
+
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(c.aget(IFooService), 0.001)
+        return await c.aget(IFooService)
+
+    svc = asyncio.run(main())
+    assert c.get(IFooService) is svc
+
+
+@pytest.mark.parametrize('context', [None, ContextA()])
+def test_aget_reset_while_pending(registry, context):
+    calls = []
+    release = None
+
+    async def factory(container):
+        calls.append(container)
+        await release.wait()
+        return DummyService()
+
+    registry.register_factory(factory, IFooService, context=ContextA)
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container(context=context)
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        task = asyncio.ensure_future(c.aget(IFooService))
+        await asyncio.sleep(0)
+        c.reset()
+        release.set()
+        svc = await task
+        assert await c.aget(IFooService) is not svc
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_aget_close_while_pending(registry):
+    release = None
+
+    async def factory(container):
+        await release.wait()
+        return DummyService()
+
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        task = asyncio.ensure_future(c.aget(IFooService))
+        await asyncio.sleep(0)
+        c.close()
+        release.set()
+        assert isinstance(await task, DummyService)
+        with pytest.raises(RuntimeError):
+            await c.aget(IFooService)
+
+    asyncio.run(main())
+
+
+def test_aget_transient_and_singleton_lifetimes(registry):
+    calls = []
+
+    class Factory:
+        async def __call__(self, container):
+            calls.append(container)
+            await asyncio.sleep(0)
+            if len(calls) == 1:
+                raise ValueError
+            return DummyService()
+
+    registry.register_factory(Factory(), IFooService, lifetime='singleton')
+    registry.register_factory(Factory(), IBarService, lifetime='transient')
+
+    async def main():
+        c1 = registry.create_container()
+        with pytest.raises(ValueError):
+            await c1.aget(IFooService)
+        results = await asyncio.gather(
+            c1.aget(IFooService), registry.create_container().aget(IFooService)
+        )
+        assert results[0] is results[1]
+        assert await registry.create_container().aget(IFooService) is results[0]
+        assert await c1.aget(IBarService) is not await c1.aget(IBarService)
+
+    asyncio.run(main())
+    assert len(calls) == 4
+
+
+def test_aget_singleton_across_event_loops(registry):
+    calls = []
+    started = threading.Event()
+    waiting = threading.Event()
+
+    async def factory(container):
+        calls.append(container)
+        started.set()
+        while not waiting.is_set():
+            await asyncio.sleep(0.001)
+        return DummyService()
+
+    registry.register_factory(factory, IFooService, lifetime='singleton')
+    results = []
+
+    async def first():
+        results.append(await registry.create_container().aget(IFooService))
+
+    async def second():
+        task = asyncio.ensure_future(registry.create_container().aget(IFooService))
+        await asyncio.sleep(0.01)
+        waiting.set()
+        results.append(await task)
+
+    t = threading.Thread(target=lambda: asyncio.run(first()))
+    t.start()
+    assert started.wait(5)
+    asyncio.run(second())
+    t.join()
+    assert len(calls) == 1
+    assert len(results) == 2
+    assert results[0] is results[1]
+
+
+def test_sync_factory_with_async_dependency(registry):
+    async def async_factory(container):
+        return DummyService()
+
+    def factory(container):
+        return container.get(IFooService)
+
+    registry.register_factory(async_factory, IFooService)
+    registry.register_factory(factory, IBarService)
+    c = registry.create_container()
+
+    async def main():
+        with pytest.raises(RuntimeError) as exc_info:
+            await c.aget(IBarService)
+        assert type(exc_info.value) is RuntimeError
+        assert 'aget' in str(exc_info.value)
+        svc = await c.aget(IFooService)
+        assert await c.aget(IBarService) is svc
+
+    asyncio.run(main())
+
+
+def test_aget_reports_to_hooks(registry):
+    hook = RecordingHook()
+    registry.add_hook(hook)
+
+    async def factory(container):
+        return DummyService()
+
+    async def failing_factory(container):
+        raise ValueError
+
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(failing_factory, IBarService)
+    c = registry.create_container()
+
+    async def main():
+        svc = await c.aget(IFooService)
+        assert await c.aget(IFooService) is svc
+        with pytest.raises(ValueError):
+            await c.aget(IBarService)
+        return svc
+
+    svc = asyncio.run(main())
+    assert hook.events == [
+        ('miss', IFooService, ''),
+        ('start', IFooService, '', factory),
+        ('end', IFooService, '', svc),
+        ('hit', IFooService, '', svc),
+        ('miss', IBarService, ''),
+        ('start', IBarService, '', failing_factory),
+        ('end', IBarService, '', None),
+    ]
+
+
+def test_aget_many(registry):
+    running = []
+    started = []
+
+    async def factory(container):
+        running.append(container)
+        started.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(container)
+        return DummyService()
+
+    registry.register_factory(factory, IFooService)
+    registry.register_factory(factory, IBarService, name='bar')
+    registry.register_factory(DummyFactory(), DummyService)
+    c = registry.create_container()
+
+    async def main():
+        services = await c.aget_many(
+            [IFooService, DummyService, (IBarService, 'bar'), IFooService]
+        )
+        assert services == (
+            c.get(IFooService),
+            c.get(DummyService),
+            c.get(IBarService, name='bar'),
+            c.get(IFooService),
+        )
+        assert await c.aget_many([DummyService], context=ContextA()) == (
+            c.get(DummyService),
+        )
+        assert await c.aget_many([IBarService], default=None) == (None,)
+
+    asyncio.run(main())
+    assert started == [1, 2]
+
+
+def test_aget_many_missing_service_after_async(registry):
+    async def factory(container):  # pragma: no cover
+        return DummyService()
+
+    registry.register_factory(factory, IFooService)
+    c = registry.create_container()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with pytest.raises(LookupError):
+            asyncio.run(c.aget_many([IFooService, IBarService]))
+        gc.collect()
+    assert not [w for w in caught if issubclass(w.category, RuntimeWarning)]
+
+
+def test_reset_discards_cached_services(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService)
+    registry.register_factory(lambda c: DummyService(), IFooService, context=ContextA)
+    container = registry.create_container()
+    context = ContextA()
+    svc = container.get(IFooService)
+    ctx_svc = container.get(IFooService, context=context)
+    value_svc = container.get(IFooService, context='a')
+    container.reset()
+    assert container.get(IFooService) is not svc
+    assert container.get(IFooService, context=context) is not ctx_svc
+    assert container.get(IFooService, context='a') is not value_svc
+    assert container.context_cache_info().misses == 1
+
+
+def test_reset_discards_local_registrations(registry):
+    registry.register_factory(DummyFactory(), IFooService)
+    container = registry.create_container()
+    local = DummyService()
+    container.register_factory(lambda c: local, IFooService)
+    container.set(DummyService(), name='extra')
+    assert container.get(IFooService) is local
+    container.reset()
+    assert container.get(IFooService) is registry.find_factory(IFooService).result
+    assert container.get(name='extra', default=None) is None
+
+
+def test_reset_reuses_cache(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService)
+    registry.register_factory(lambda c: DummyService(), IFooService, context=ContextA)
+    container = registry.create_container()
+    cache = container._cache
+    container.get(IFooService)
+    none_cache = cache.get(None)
+    context = ContextA()
+    container.get(IFooService, context=context)
+    finalizer = cache.get(context).finalizer
+    container.reset()
+    assert container._cache is cache
+    assert cache.get(None) is none_cache
+    assert list(cache._contexts) == [id(None)]
+    assert not finalizer.alive
+
+
+def test_reset_resolvers(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService)
+    registry.register_factory(lambda c: DummyService(), IFooService, context=ContextA)
+    container = registry.create_container()
+    context = ContextA()
+    resolve = container.resolver(IFooService)
+    resolve_ctx = container.resolver(IFooService, context=context)
+    svc, ctx_svc = resolve(), resolve_ctx()
+    container.reset()
+    assert resolve() is not svc
+    assert resolve() is container.get(IFooService)
+    assert resolve_ctx() is not ctx_svc
+    assert resolve_ctx() is container.get(IFooService, context=context)
+
+
+def test_cache_is_created_lazily(registry):
+    registry.register_factory(DummyFactory(), IFooService)
+    container = registry.create_container()
+    assert '_cache' not in vars(container)
+    container.get(IFooService)
+    assert '_cache' in vars(container)
+    with pytest.raises(AttributeError, match='missing'):
+        container.missing
+
+
+def test_container_without_registry():
+    from wired import ServiceContainer
+
+    container = ServiceContainer(AdapterRegistry())
+    assert container.get(IFooService, default=None) is None
+    svc = DummyService()
+    container.set(svc, IFooService)
+    assert container.get(IFooService) is svc
+
+
+def test_close_runs_cleanups_in_reverse_order(registry):
+    calls = []
+
+    def make_factory(label, *deps):
+        def factory(container):
+            for dep in deps:
+                container.get(name=dep)
+            container.add_cleanup(lambda: calls.append(label))
+            return DummyService()
+
+        return factory
+
+    registry.register_factory(make_factory('db'), name='db')
+    registry.register_factory(make_factory('session', 'db'), name='session')
+    container = registry.create_container()
+    container.get(name='session')
+    assert calls == []
+    container.close()
+    assert calls == ['session', 'db']
+    container.close()
+    assert calls == ['session', 'db']
+
+
+def test_closed_container_cannot_create_services(registry):
+    registry.register_factory(DummyFactory(), IFooService)
+    container = registry.create_container()
+    container.get(IFooService)
+    container.close()
+    with pytest.raises(RuntimeError, match='closed'):
+        container.get(IFooService)
+    with pytest.raises(RuntimeError, match='closed'):
+        container.add_cleanup(lambda: None)
+
+
+def test_container_context_manager(registry):
+    calls = []
+
+    def factory(container):
+        container.add_cleanup(lambda: calls.append(container))
+        return DummyService()
+
+    registry.register_factory(factory, IFooService)
+    with registry.create_container() as container:
+        container.get(IFooService)
+    assert len(calls) == 1
+    with pytest.raises(RuntimeError):
+        container.get(IFooService)
+
+
+def test_cleanup_errors(registry):
+    calls = []
+
+    def fail(label):
+        calls.append(label)
+        raise ValueError(label)
+
+    registry.register_factory(DummyFactory(), IFooService)
+    container = registry.create_container()
+    container.get(IFooService)
+    container.add_cleanup(lambda: fail('first'))
+    container.add_cleanup(lambda: calls.append('ok'))
+    container.add_cleanup(lambda: fail('last'))
+    with pytest.raises(ValueError, match='last'):
+        container.reset()
+    assert calls == ['last', 'ok', 'first']
+    assert container._cache.get(None).instances == {}
+
+
+def test_reset_runs_cleanups(registry):
+    calls = []
+    registry.register_factory(DummyFactory(), IFooService)
+    container = registry.create_container()
+    container.add_cleanup(lambda: calls.append(1))
+    container.reset()
+    assert calls == [1]
+    container.reset()
+    assert calls == [1]
+    assert container.get(IFooService) is not None
+
+
+def test_closed_container_is_freed_by_refcount(registry):
+    class Request:
+        def __init__(self, container):
+            self.container = container
+
+    registry.register_factory(Request, Request)
+    registry.register_factory(
+        lambda c: (c.get(Request), c.get(name='url')), IFooService, context=ContextA
+    )
+
+    def process_request():
+        with registry.create_container() as container:
+            container.register_singleton('/', name='url')
+            container.get(IFooService, context=ContextA())
+            container.get(Request, context='value')
+
+    # create the plans shared with the registry up front
+    process_request()
+    gc.collect()
+    gc.disable()
+    try:
+        process_request()
+        assert gc.collect() == 0
+    finally:
+        gc.enable()
+
+
+def test_pooled_service_is_returned_on_close(registry):
+    created = []
+
+    def factory(container):
+        created.append(DummyService())
+        return created[-1]
+
+    pool = registry.register_pooled(factory, IFooService, maxsize=2)
+    assert registry.find_factory(IFooService) is pool
+    c1 = registry.create_container()
+    c2 = registry.create_container()
+    svc1 = c1.get(IFooService)
+    assert c1.get(IFooService) is svc1
+    svc2 = c2.get(IFooService)
+    assert svc1 is not svc2
+    assert pool.info()[:4] == (2, 2, 2, 2)
+    c1.close()
+    assert pool.info().in_use == 1
+    with registry.create_container() as c3:
+        assert c3.get(IFooService) is svc1
+    c2.close()
+    assert created == [svc1, svc2]
+    assert pool.info() == (2, 2, 0, 3, 0, 0.0, 0.0)
+
+
+def test_pooled_service_waits_for_checkin(registry):
+    pool = registry.register_pooled(lambda c: DummyService(), IFooService, maxsize=1)
+    container = registry.create_container()
+    svc = container.get(IFooService)
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(registry.create_container().get(IFooService))
+    )
+    thread.start()
+    thread.join(0.1)
+    assert pool.info().waits == 1
+    container.close()
+    thread.join(5)
+    assert results == [svc]
+    info = pool.info()
+    assert info.waits == 1
+    assert info.wait_time > 0
+    assert info.max_wait == info.wait_time
+
+
+def test_pooled_service_timeout(registry):
+    registry.register_pooled(
+        lambda c: DummyService(), IFooService, maxsize=1, timeout=0.01
+    )
+    container = registry.create_container()
+    container.get(IFooService)
+    with pytest.raises(TimeoutError):
+        registry.create_container().get(IFooService)
+
+
+def test_pooled_service_is_returned_on_gc(registry):
+    pool = registry.register_pooled(
+        lambda c: DummyService(), IFooService, maxsize=1, timeout=1
+    )
+    container = registry.create_container()
+    svc = container.get(IFooService)
+    del container
+    gc.collect()
+    assert pool.info().in_use == 0
+    container = registry.create_container()
+    assert container.get(IFooService) is svc
+    container.close()
+    del container
+    gc.collect()
+    assert pool.info().in_use == 0
+    assert pool.idle == [svc]
+
+
+def test_pooled_service_is_returned_if_cleanup_fails(registry):
+    pool = registry.register_pooled(lambda c: DummyService(), IFooService)
+    container = registry.create_container()
+    container.close()
+    with pytest.raises(RuntimeError):
+        pool(container)
+    info = pool.info()
+    assert info.size == 1
+    assert info.in_use == 0
+    assert len(pool.idle) == 1
+
+
+def test_pooled_factory_failure_releases_slot(registry):
+    calls = []
+
+    def factory(container):
+        calls.append(container)
+        if len(calls) == 1:
+            raise ValueError
+        return DummyService()
+
+    pool = registry.register_pooled(factory, IFooService, maxsize=1)
+    with pytest.raises(ValueError):
+        registry.create_container().get(IFooService)
+    assert pool.info().size == 0
+    assert registry.create_container().get(IFooService) is not None
+    assert pool.info().size == 1
+
+
+def test_pooled_wired_factory(registry):
+    pool = registry.register_pooled(DummyWiredFactory, IFooService)
+    svc = registry.create_container().get(IFooService)
+    assert isinstance(svc, DummyWiredFactory)
+    assert pool.info().size == 1
+
+
+def test_register_pooled_invalid(registry):
+    async def factory(container):
+        pass  # pragma: no cover
+
+    with pytest.raises(ValueError):
+        registry.register_pooled(factory, IFooService)
+    with pytest.raises(ValueError):
+        registry.register_pooled(DummyFactory(), IFooService, maxsize=0)
+
+
+def test_template_shares_cached_services(registry):
+    calls = []
+
+    def factory(container):
+        calls.append(container)
+        return DummyService()
+
+    registry.register_factory(factory, name='config')
+    registry.register_factory(factory, name='request')
+    template = registry.create_container()
+    config = template.get(name='config')
+    child = registry.create_container(template=template)
+    assert child.get(name='config') is config
+    request = child.get(name='request')
+    assert len(calls) == 2
+    assert template.get(name='request') is not request
+    other = template.fork()
+    assert other.get(name='config') is config
+    assert other.get(name='request') is template.get(name='request')
+    assert len(calls) == 3
+
+
+def test_template_shares_services_per_context(registry):
+    registry.register_factory(
+        lambda c: (c.context, DummyService()), IFooService, context=Interface
+    )
+    template = registry.create_container()
+    context = ContextA()
+    svc = template.get(IFooService, context=context)
+    value_svc = template.get(IFooService, context='a')
+    child = template.fork()
+    assert child.get(IFooService, context=context) is svc
+    assert child.get(IFooService, context='a') is value_svc
+    assert child.get(IFooService, context=ContextA()) is not svc
+
+
+def test_template_local_registrations(registry):
+    registry.register_factory(DummyFactory(), IFooService)
+    template = registry.create_container()
+    config = DummyService()
+    template.register_singleton(config, name='config')
+    template.register_factory(lambda c: DummyService(), name='lazy')
+    child = template.fork()
+    assert child.get(name='config') is config
+    override = DummyService()
+    child.register_singleton(override, IFooService)
+    assert child.get(IFooService) is override
+    assert template.get(IFooService) is registry.find_factory(IFooService).result
+
+    # the fork keeps using the factories if the template is closed
+    template.close()
+    assert child.get(name='lazy') is not None
+
+
+def test_reset_fork_restores_template_services(registry):
+    registry.register_factory(lambda c: DummyService(), IFooService)
+    template = registry.create_container()
+    svc = template.get(IFooService)
+    assert template.get(IFooService) is svc
+    child = template.fork()
+    assert child.get(IFooService) is svc
+    child.reset()
+    assert child.get(IFooService) is svc
+
+
+@pytest.mark.parametrize('thread_safe', [False, True])
+def test_template_does_not_share_pooled_services(registry, thread_safe):
+    pool = registry.register_pooled(lambda c: DummyService(), IBarService)
+    registry.register_factory(lambda c: DummyService(), name='config')
+    template = registry.create_container(thread_safe=thread_safe)
+    conn = template.get(IBarService)
+    assert template.get(IFooService) is conn
+    config = template.get(name='config')
+    assert template.get(name='config') is config
+    assert template.get(IFooService) is conn
+    a = template.fork()
+    b = template.fork()
+    assert a.get(name='config') is config
+    assert a.get(IFooService) is not conn
+    assert a.get(IBarService) is a.get(IFooService)
+    assert b.get(IBarService) not in (conn, a.get(IBarService))
+    assert pool.info().in_use == 3
+    a.reset()
+    assert pool.info().in_use == 2
+    assert a.get(name='config') is config
+    template.close()
+    assert pool.idle[-1] is conn
+    b.close()
+    assert pool.info().in_use == 0
+
+
+def test_fork_instrumented_container(registry):
+    hook = RecordingHook()
+    registry.add_hook(hook)
+    svc = DummyService()
+    registry.register_singleton(svc, IFooService)
+    template = registry.create_container()
+    template.get(IFooService)
+    child = template.fork()
+    hook.events.clear()
+    assert child.get(IFooService) is svc
+    assert hook.events == [('hit', IFooService, '', svc)]
+
+
+def test_template_from_another_registry(registry):
+    from wired import ServiceRegistry
+
+    template = ServiceRegistry().create_container()
+    with pytest.raises(ValueError):
+        registry.create_container(template=template)